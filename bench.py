@@ -0,0 +1,861 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for rss.py: runs poll cycles against a local server that plays fixture feeds
+back and stands in for the Discord webhooks, so cycle times can be measured (and output compared)
+without touching xkcd, The Spinoff, YouTube or Discord.
+
+Usage:
+  - python bench.py                       generated fixtures: 500 YouTube channels, 4 news feeds
+                                          of 1,000 entries, 2 comics and 2 generic feeds
+  - python bench.py --record fixtures/    save the live feeds configured in rss.py once
+  - python bench.py --fixtures fixtures/  play saved feeds back instead of generated ones (their
+                                          images still point at the real hosts)
+  - python bench.py --check-extraction    compare rss.py's entry HTML extraction with the reference
+                                          implementation (a parse per step, as before the single-parse
+                                          extract_entry_html()) on a generated corpus; exits with
+                                          status 1 on any difference
+
+The server runs in its own process so its work does not count towards the measured CPU time and
+memory. It sends ETags and answers If-None-Match with 304 (--no-etag turns this off), delays every
+response by --latency seconds (+/- 50%) and fails --error-rate of the feed requests with a 503.
+Webhooks allow --rate-limit posts per --rate-window seconds and answer the excess with a Discord
+style 429 (X-RateLimit-* headers and a JSON retry_after); messages with more than 10 embeds or
+6000 characters get a 400.
+
+The first cycle posts every fixture entry. Before each further cycle, every --changed-every-th
+generated feed publishes --new-entries new entries. With --websub the feeds are subscribed at the
+server's stand-in WebSub hub (/hub) after the first cycle, the hub pushes the new entries to
+rss.py's callback server with an HMAC signature, and the further cycles process the pushed feeds
+only instead of polling them all. Each cycle reports wall time, CPU time per
+stage (fetch, parse, extract, validate and send, summed over threads), bytes transferred and the
+messages delivered; peak RSS is reported at the end. --save-posts writes the delivered messages
+with the server address replaced by a placeholder, so the output of two versions can be diffed.
+
+rss.py settings (FETCH_WORKERS, HOST_CONCURRENCY, STREAM_PARSE, ...) are read from the environment
+as usual. All fixtures are served from 127.0.0.1, which therefore gets the per-host concurrency
+limit that www.youtube.com gets in production; raise it with HOST_CONCURRENCY_OVERRIDES.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+from xml.sax.saxutils import escape
+
+LOG = logging.getLogger("bench")
+
+# Fixed "now" of the generated feeds, so fixtures are the same on every run
+EPOCH = 1760000000
+BASE = "http://fixtures"  # replaces the server address in saved posts
+
+
+def _pubdate(ts: float) -> str:
+    return time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(ts))
+
+
+def _isodate(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(ts))
+
+
+def _rss(title: str, link: str, items: List[str], base: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:media="http://search.yahoo.com/mrss/" '
+        'xmlns:atom="http://www.w3.org/2005/Atom">'
+        f"<channel><title>{escape(title)}</title><link>{link}</link><description>{escape(title)}</description>"
+        f'<atom:link rel="hub" href="{base}/hub"/><atom:link rel="self" href="{base}/feeds/{escape(title)}"/>'
+        + "".join(items)
+        + "</channel></rss>"
+    )
+
+
+def youtube_feed(name: str, top: int, base: str, count: int = 15) -> str:
+    """A channel's videos.xml: the newest `count` of videos 1..top."""
+    channel = name.split(":", 1)[-1]
+    entries = []
+    for i in range(top, max(0, top - count), -1):
+        vid = f"{channel[-6:]}{i:05d}"
+        ts = EPOCH - (top - i) * 86400
+        entries.append(
+            f"<entry><id>yt:video:{vid}</id><yt:videoId>{vid}</yt:videoId><yt:channelId>{channel}</yt:channelId>"
+            f"<title>{escape(name)} video {i}</title>"
+            f'<link rel="alternate" href="https://www.youtube.com/watch?v={vid}"/>'
+            f"<author><name>{escape(name)}</name></author>"
+            f"<published>{_isodate(ts)}</published><updated>{_isodate(ts)}</updated>"
+            f"<media:group><media:title>{escape(name)} video {i}</media:title>"
+            f'<media:content url="https://www.youtube.com/v/{vid}?version=3" type="application/x-shockwave-flash" width="640" height="390"/>'
+            f'<media:thumbnail url="https://i1.ytimg.com/vi/{vid}/hqdefault.jpg" width="480" height="360"/>'
+            f"<media:description>Video {i} of {escape(name)}. " + "Lorem ipsum dolor sit amet. " * 20 + "</media:description>"
+            f'<media:community><media:starRating count="{i}" average="5.00" min="1" max="5"/></media:community>'
+            f"</media:group></entry>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" '
+        'xmlns="http://www.w3.org/2005/Atom">'
+        f'<link rel="hub" href="{base}/hub"/><link rel="self" href="{base}/feeds/{name}"/><id>yt:channel:{channel}</id>'
+        f"<title>{escape(name)}</title>"
+        + "".join(entries)
+        + "</feed>"
+    )
+
+
+def news_feed(name: str, top: int, base: str, count: int = 1000) -> str:
+    """A news site feed with full HTML articles, lazy-loaded images and ads."""
+    items = []
+    for i in range(top, max(0, top - count), -1):
+        paragraphs = "".join(f"<p>Paragraph {p} of story {i}. " + "Some reporting here &amp; there. " * 8 + "</p>" for p in range(6))
+        html = (
+            f'<figure><img src="data:image/gif;base64,R0lGOD" data-src="{base}/img/{name}/{i}.jpg" alt="">'
+            f'<noscript><img src="{base}/img/{name}/{i}.jpg" alt=""></noscript></figure>'
+            f"<h2>Story {i}</h2>{paragraphs}"
+            f'<div class="advert"><p>Sponsored</p><img src="{base}/img/ads/{i % 7}.png"></div>'
+            f"<script>track({i});</script>"
+        )
+        items.append(
+            f"<item><title>{escape(name)} story {i}</title><link>{base}/{name}/story/{i}</link>"
+            f'<guid isPermaLink="false">{name}-{i}</guid><pubDate>{_pubdate(EPOCH - (top - i) * 1800)}</pubDate>'
+            f"<dc:creator>Reporter {i % 13}</dc:creator><category>News</category>"
+            f"<description>{escape(f'<p>Summary of story {i}.</p>')}</description>"
+            f"<content:encoded><![CDATA[{html}]]></content:encoded></item>"
+        )
+    return _rss(name, f"{base}/{name}", items, base)
+
+
+def comic_feed(name: str, top: int, base: str, count: int = 4) -> str:
+    """An xkcd-style feed: one image per entry and its alt text."""
+    items = []
+    for i in range(top, max(0, top - count), -1):
+        img = f'<img src="{base}/img/{name}/{i}.png" title="Alt text of comic {i}" alt="Comic {i}" />'
+        items.append(
+            f"<item><title>Comic {i}</title><link>{base}/{name}/{i}/</link>"
+            f"<description>{escape(img)}</description><pubDate>{_pubdate(EPOCH - (top - i) * 2 * 86400)}</pubDate>"
+            f"<guid>{base}/{name}/{i}/</guid></item>"
+        )
+    return _rss(name, f"{base}/{name}", items, base)
+
+
+def generic_feed(name: str, top: int, base: str, count: int = 50) -> str:
+    """A blog feed with short HTML descriptions and enclosures."""
+    items = []
+    for i in range(top, max(0, top - count), -1):
+        html = f'<p>Post {i}: ' + "words " * 40 + f'</p><img src="{base}/img/{name}/{i}.jpg">'
+        items.append(
+            f"<item><title>Post {i}</title><link>{base}/{name}/post/{i}</link><guid>{name}-post-{i}</guid>"
+            f"<pubDate>{_pubdate(EPOCH - (top - i) * 43200)}</pubDate><description>{escape(html)}</description>"
+            f'<enclosure url="{base}/img/{name}/{i}-large.jpg" type="image/jpeg" length="1000"/></item>'
+        )
+    return _rss(name, f"{base}/{name}", items, base)
+
+
+GENERATORS = {
+    "youtube": youtube_feed,
+    "html-article": news_feed,
+    "comic": comic_feed,
+    "generic": generic_feed,
+}
+
+
+class Fixture:
+    """One feed served by the fixture server: generated (and able to publish new entries) or recorded."""
+
+    def __init__(self, name: str, kind: str, top: int = 0, body: Optional[bytes] = None, count: Optional[int] = None):
+        self.name = name
+        self.kind = kind
+        self.top = top
+        self.count = count
+        self._body = body
+        self._rendered: Optional[bytes] = None
+        self._rendered_top = -1
+
+    def body(self, base: str, count: Optional[int] = None) -> bytes:
+        """The feed document, or with `count` one with only its newest `count` entries."""
+        if count is not None:
+            return GENERATORS[self.kind](self.name, self.top, base, count=count).encode("utf-8")
+        if self._body is not None:
+            return self._body
+        if self._rendered_top != self.top:
+            kwargs = {"count": self.count} if self.count else {}
+            self._rendered = GENERATORS[self.kind](self.name, self.top, base, **kwargs).encode("utf-8")
+            self._rendered_top = self.top
+        return self._rendered
+
+    def etag(self) -> str:
+        if self._body is not None:
+            return '"%08x"' % zlib.crc32(self._body)
+        return f'"{self.top}"'
+
+
+def generated_fixtures(args) -> List[Fixture]:
+    r = random.Random(args.seed)
+    fixtures = [Fixture(f"youtube:UC{r.getrandbits(64):016x}", "youtube", top=r.randint(15, 400)) for _ in range(args.channels)]
+    fixtures += [Fixture(f"news{i}", "html-article", top=5000, count=args.news_entries) for i in range(args.news_feeds)]
+    fixtures += [Fixture(f"comic{i}", "comic", top=3000) for i in range(args.comics)]
+    fixtures += [Fixture(f"blog{i}", "generic", top=200) for i in range(args.generic)]
+    return fixtures
+
+
+def recorded_fixtures(directory: str) -> List[Fixture]:
+    """Load feeds saved by --record; file names are <type>--<feed name>.xml."""
+    fixtures = []
+    for filename in sorted(os.listdir(directory)):
+        m = re.match(r"(.+?)--(.+)\.xml$", filename)
+        if not m or m.group(1) not in GENERATORS:
+            continue
+        with open(os.path.join(directory, filename), "rb") as f:
+            fixtures.append(Fixture(m.group(2).replace("_", ":", 1) if m.group(1) == "youtube" else m.group(2), m.group(1), body=f.read()))
+    return fixtures
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serves fixture feeds under /feeds/<name>, images under /img/ and webhooks under /webhooks/<name>,
+    and is the WebSub hub (/hub) the generated feeds advertise."""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, args, fixtures: List[Fixture]):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.args = args
+        self.base = f"http://127.0.0.1:{self.server_address[1]}"
+        self.fixtures = {f.name: f for f in fixtures}
+        self.lock = threading.Lock()
+        self.random = random.Random(args.seed)
+        self.stats: Dict[str, int] = {}
+        self.posts: Dict[str, List[Dict]] = {}
+        self.buckets: Dict[str, List[float]] = {}  # webhook -> [remaining, reset_at]
+        self.subscriptions: Dict[str, Tuple[str, str]] = {}  # topic -> (callback, secret)
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections are not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FixtureServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+            self.server.count("bytes_out", len(body))
+
+    def _json(self, status: int, data, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(data).encode("utf-8"), dict(headers or {}, **{"Content-Type": "application/json"}))
+
+    def _delay(self) -> None:
+        latency = self.server.args.latency
+        if latency > 0:
+            time.sleep(latency * (0.5 + self.server.random.random()))
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        server = self.server
+        path = urlsplit(self.path).path
+        if path.startswith("/_"):
+            return self._control(path)
+        self._delay()
+        server.count("requests")
+        if path.startswith("/img/"):
+            server.count("image_requests")
+            ctype = "image/png" if path.endswith(".png") else "image/jpeg"
+            return self._send(200, b"\x89PNG fixture", {"Content-Type": ctype})
+        fixture = server.fixtures.get(path[len("/feeds/"):]) if path.startswith("/feeds/") else None
+        if fixture is None:
+            return self._send(404)
+        server.count("feed_requests")
+        if server.random.random() < server.args.error_rate:
+            server.count("errors")
+            return self._send(503, b"injected error")
+        with server.lock:
+            etag = fixture.etag()
+            if not server.args.no_etag and self.headers.get("If-None-Match") == etag:
+                body = None
+            else:
+                body = fixture.body(server.base)
+        if body is None:
+            server.count("not_modified")
+            return self._send(304, headers={"ETag": etag})
+        headers = {"Content-Type": "application/xml; charset=utf-8"}
+        if not server.args.no_etag:
+            headers["ETag"] = etag
+        self._send(200, body, headers)
+
+    def do_POST(self):
+        server = self.server
+        path = urlsplit(self.path).path
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if path.startswith("/_"):
+            return self._control(path)
+        if path == "/hub":
+            return self._hub(body)
+        if not path.startswith("/webhooks/"):
+            return self._send(404)
+        self._delay()
+        server.count("bytes_in", len(body))
+        webhook = path[len("/webhooks/"):]
+        limit, window = server.args.rate_limit, server.args.rate_window
+        with server.lock:
+            bucket = server.buckets.setdefault(webhook, [limit, 0.0])
+            now = time.time()
+            if now >= bucket[1]:
+                bucket[0], bucket[1] = limit, now + window
+            if bucket[0] <= 0:
+                retry_after = bucket[1] - now
+                server.stats["rate_limited"] = server.stats.get("rate_limited", 0) + 1
+            else:
+                bucket[0] -= 1
+                retry_after = None
+            headers = {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(int(bucket[0])),
+                "X-RateLimit-Reset-After": "%.3f" % max(0.0, bucket[1] - now),
+                "X-RateLimit-Bucket": webhook,
+            }
+        if retry_after is not None:
+            headers["Retry-After"] = str(int(retry_after) + 1)
+            return self._json(429, {"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": False}, headers)
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            server.count("bad_requests")
+            return self._json(400, {"message": "Cannot send an empty message", "code": 50006}, headers)
+        embeds = payload.get("embeds") or []
+        size = sum(len(e.get("title", "")) + len(e.get("description", "")) for e in embeds)
+        if len(embeds) > 10 or size > 6000:
+            server.count("bad_requests")
+            return self._json(400, {"message": "Invalid Form Body", "code": 50035}, headers)
+        with server.lock:
+            server.posts.setdefault(webhook, []).append(payload)
+            server.stats["messages"] = server.stats.get("messages", 0) + 1
+            server.stats["embeds"] = server.stats.get("embeds", 0) + len(embeds)
+        self._send(204, headers=headers)
+
+    def _hub(self, body: bytes) -> None:
+        """Accept a (un)subscription request and verify it with the subscriber asynchronously."""
+        form = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+        mode, topic, callback = form.get("hub.mode"), form.get("hub.topic"), form.get("hub.callback")
+        if mode not in ("subscribe", "unsubscribe") or not topic or not callback:
+            return self._send(400, b"hub.mode, hub.topic and hub.callback are required")
+        self._send(202)
+        threading.Thread(target=_verify_subscription, args=(self.server, form), daemon=True).start()
+
+    def _control(self, path: str) -> None:
+        server = self.server
+        if path == "/_feeds":
+            return self._json(200, [{"name": f.name, "type": f.kind} for f in server.fixtures.values()])
+        if path == "/_stats":
+            with server.lock:
+                stats = dict(server.stats)
+            return self._json(200, stats)
+        if path == "/_posts":
+            with server.lock:
+                posts = json.loads(json.dumps(server.posts))
+            return self._json(200, posts)
+        if path == "/_advance":
+            query = parse_qs(urlsplit(self.path).query)
+            new, every = int(query["new"][0]), max(1, int(query["every"][0]))
+            changed = 0
+            pushes = []
+            with server.lock:
+                for i, fixture in enumerate(server.fixtures.values()):
+                    if fixture._body is None and i % every == 0:
+                        fixture.top += new
+                        changed += 1
+                        subscription = server.subscriptions.get(f"{server.base}/feeds/{fixture.name}")
+                        if subscription:
+                            pushes.append((subscription, fixture.body(server.base, count=new)))
+            threading.Thread(target=_push, args=(server, pushes), daemon=True).start()
+            return self._json(200, {"changed": changed, "pushed": len(pushes)})
+        self._send(404)
+
+
+def _verify_subscription(server: FixtureServer, form: Dict[str, str]) -> None:
+    import urllib.request
+
+    challenge = "%016x" % random.getrandbits(64)
+    query = {key: form[key] for key in ("hub.mode", "hub.topic") if key in form}
+    query.update({"hub.challenge": challenge, "hub.lease_seconds": form.get("hub.lease_seconds") or "86400"})
+    callback = form["hub.callback"]
+    try:
+        with urllib.request.urlopen(callback + ("&" if "?" in callback else "?") + urlencode(query), timeout=30) as resp:
+            verified = resp.status == 200 and resp.read().decode("utf-8") == challenge
+    except OSError:
+        verified = False
+    if not verified:
+        server.count("websub_refused")
+        return
+    with server.lock:
+        if form["hub.mode"] == "subscribe":
+            server.subscriptions[form["hub.topic"]] = (callback, form.get("hub.secret", ""))
+        else:
+            server.subscriptions.pop(form["hub.topic"], None)
+    server.count("websub_verified")
+
+
+def _push(server: FixtureServer, pushes: List[Tuple[Tuple[str, str], bytes]]) -> None:
+    """Distribute content to subscribers like a hub: signed with the subscription's secret."""
+    import urllib.request
+
+    for (callback, secret), body in pushes:
+        headers = {"Content-Type": "application/atom+xml"}
+        if secret:
+            headers["X-Hub-Signature"] = "sha1=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha1).hexdigest()
+        try:
+            urllib.request.urlopen(urllib.request.Request(callback, data=body, headers=headers), timeout=30).close()
+            server.count("websub_pushes")
+        except OSError:
+            server.count("websub_push_errors")
+
+
+def serve(args, fixtures: List[Fixture], conn) -> None:
+    server = FixtureServer(args, fixtures)
+    conn.send(server.base)
+    server.serve_forever()
+
+
+def _control(base: str, path: str):
+    import requests
+
+    return requests.get(base + path, timeout=30).json()
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Building blocks of the extraction corpus: lazy and noscript images, ads, scripts, entities,
+# nested, broken and commented-out markup
+HTML_FRAGMENTS = [
+    "<p>Hello &amp; <b>world</b></p>",
+    "<h2>Head &lt;x&gt;</h2>",
+    '<div class="ad"><p>Buy!</p><img src="https://ads.example/x.png"></div>',
+    '<img src="data:image/gif;base64,AAA" data-src="https://images.example/a.jpg">',
+    '<noscript><img src="https://images.example/a.jpg" alt="x"></noscript>',
+    '<NOSCRIPT><IMG SRC="https://images.example/b.png"></NOSCRIPT>',
+    '<script>var s="<p>no</p>";</script>',
+    "<style>p{}</style>",
+    '<iframe src="https://video.example/embed"></iframe>',
+    "<p><p>nested</p> tail</p>",
+    "<img src='https://single.example/q.jpg'>",
+    '<img alt=x src="/rel/path.png">',
+    "<p>   </p>",
+    "<h1>Title &amp;amp; co</h1>",
+    "<h3>&#8220;Quote&#8221;</h3>",
+    '<figure><img src="" ><noscript><img src="https://images.example/2.jpg"></noscript></figure>',
+    "<p>broken <i>tags",
+    "</div></p>",
+    '<img src="https://sp ace.example/x.jpg ">',
+    '<p class="advert">sponsored</p>',
+    '<a href="x"><img data-lazy-src="y" src="https://images.example/1.gif"></a>',
+    "plain text & stuff",
+    "<![CDATA[weird]]>",
+    '<!-- <img src="https://comment.example/c.png"> -->',
+    '<noscript>&lt;img src="https://escaped.example/e.png"&gt;</noscript>',
+    "<p>" + "long text " * 300 + "</p>",
+]
+
+
+def extraction_corpus(seed: int, count: int = 3000) -> List:
+    """Entries covering the shapes extract_entry_html() handles: `count` parsed RSS items with
+    description, content:encoded (CDATA or escaped), media and enclosures in every combination,
+    plus plain dict entries with only a summary or a description."""
+    import feedparser
+
+    rng = random.Random(seed)
+
+    def html() -> str:
+        return "".join(rng.choice(HTML_FRAGMENTS) for _ in range(rng.randint(0, 12)))
+
+    items = []
+    for i in range(count):
+        kind, body = rng.randint(0, 4), html()
+        media = f'<media:thumbnail url="https://media.example/t{i}.jpg"/>' if rng.random() < 0.3 else ""
+        media += f'<media:content url="https://media.example/c{i}.jpg" medium="image"/>' if rng.random() < 0.2 else ""
+        media += f'<enclosure url="https://media.example/{i}.jpg" type="image/jpeg" length="1"/>' if rng.random() < 0.2 else ""
+        content = [
+            f"<description>{escape(body)}</description>",
+            f"<description>{escape(html())}</description><content:encoded><![CDATA[{body}]]></content:encoded>",
+            f"<content:encoded><![CDATA[{body}]]></content:encoded>",
+            "",
+            f"<description>{escape(body)}</description><content:encoded>{escape(body)}</content:encoded>",
+        ][kind]
+        items.append(f"<item><title>t{i}</title><link>https://example.com/{i}</link>{media}{content}</item>")
+    document = (
+        '<?xml version="1.0"?><rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" '
+        'xmlns:media="http://search.yahoo.com/mrss/"><channel><title>corpus</title>' + "".join(items) + "</channel></rss>"
+    )
+    entries = list(feedparser.parse(document).entries)
+    entries += [feedparser.FeedParserDict(summary="", description=html()) for _ in range(count // 15)]
+    entries += [feedparser.FeedParserDict(summary=html()) for _ in range(count // 15)]
+    return entries
+
+
+# The extraction as it was before extract_entry_html(): a parse per step, the reference its output
+# has to match exactly
+_REFERENCE_IMG_RE = re.compile(r"<img[^>]+src=[\"']([^\"']+)[\"']", re.I)
+
+
+def _reference_html(entry) -> str:
+    if hasattr(entry, "content") and entry.content:
+        try:
+            return entry.content[0].value
+        except Exception:
+            return ""
+    return ""
+
+
+def reference_images(entry) -> List[str]:
+    from bs4 import BeautifulSoup
+
+    imgs: List[str] = []
+    for field in ("media_thumbnail", "media_content"):
+        try:
+            media = entry.get(field)
+            if isinstance(media, list):
+                for item in media:
+                    url = (item.get("url") if isinstance(item, dict) else None) or getattr(item, "url", None)
+                    if url:
+                        imgs.append(url)
+            elif isinstance(media, dict):
+                url = media.get("url") or media.get("href")
+                if url:
+                    imgs.append(url)
+        except Exception:
+            pass
+    try:
+        if hasattr(entry, "content") and entry.content:
+            for c in entry.content:
+                if isinstance(c, dict):
+                    val, t = c.get("value") or c.get("text"), c.get("type")
+                else:
+                    val, t = getattr(c, "value", None), getattr(c, "type", None)
+                if val and (t is None or "html" in (t or "")):
+                    imgs.extend(_REFERENCE_IMG_RE.findall(val))
+    except Exception:
+        pass
+    try:
+        for enc in entry.get("enclosures", []) or []:
+            url = enc.get("href") or enc.get("url")
+            if url and (enc.get("type", "").startswith("image") or url.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".webp"))):
+                imgs.append(url)
+    except Exception:
+        pass
+    try:
+        for ln in entry.get("links", []) or []:
+            if ln.get("rel") in ("enclosure", "related"):
+                url = ln.get("href") or ln.get("url")
+                if url and ln.get("type", "").startswith("image"):
+                    imgs.append(url)
+    except Exception:
+        pass
+    html = _reference_html(entry)
+    if not html and entry.get("summary"):
+        html = entry.get("summary", "")
+    if html:
+        imgs.extend(_REFERENCE_IMG_RE.findall(html))
+    try:
+        soup = BeautifulSoup(html, "html.parser") if html else None
+        nos = soup.find("noscript") if soup else None
+        if nos:
+            try:
+                for img in BeautifulSoup(nos.decode_contents(), "html.parser").find_all("img"):
+                    if img.get("src"):
+                        imgs.append(img.get("src"))
+            except Exception:
+                pass
+    except Exception:
+        pass
+    seen = set()
+    out: List[str] = []
+    for url in imgs:
+        url = (url or "").strip()
+        if url and url not in seen:
+            seen.add(url)
+            out.append(url)
+    return out
+
+
+def reference_summary(entry) -> Tuple[str, Optional[str]]:
+    from html import unescape
+
+    from bs4 import BeautifulSoup
+
+    html = _reference_html(entry) or entry.get("summary", "") or entry.get("description", "") or ""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.select(".ad, .advert, script, style, iframe"):
+        tag.decompose()
+    img_url = None
+    img = soup.find("img")
+    if img:
+        src = img.get("src") or ""
+        if src.startswith("data:") or src.strip() == "":
+            nos = soup.find("noscript")
+            if nos:
+                try:
+                    nimg = BeautifulSoup(nos.decode_contents(), "html.parser").find("img")
+                    if nimg and nimg.get("src"):
+                        img_url = nimg.get("src")
+                except Exception:
+                    img_url = None
+        else:
+            img_url = src
+    parts = []
+    for el in soup.find_all(["h1", "h2", "h3", "p"]):
+        text = el.get_text(strip=True)
+        if text:
+            parts.append(unescape(text))
+        if len(parts) >= 6:
+            break
+    return "\n\n".join(parts)[:4000], img_url
+
+
+def check_extraction(seed: int) -> int:
+    """Compare rss.py's extraction with the reference on the corpus; return the number of entries
+    whose output differs."""
+    import rss
+
+    entries = extraction_corpus(seed)
+    mismatches = 0
+    for i, entry in enumerate(entries):
+        expected = (reference_images(entry), reference_summary(entry))
+        single = rss.extract_entry_html(entry)
+        got = [(rss.extract_all_images(entry), rss.clean_html_summary(entry)), (single[0], single[1:])]
+        if any(result != expected for result in got):
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"entry {i} differs:\n  reference {expected!r}\n  rss.py    {got!r}")
+    timings = {}
+    for label, extract in (
+        ("reference", lambda entry: (reference_images(entry), reference_summary(entry))),
+        ("extract_entry_html", rss.extract_entry_html),
+    ):
+        started = time.process_time()
+        for entry in entries:
+            extract(entry)
+        timings[label] = time.process_time() - started
+    print(
+        f"{len(entries)} entries, {mismatches} differ from the reference; "
+        + ", ".join(f"{label} {seconds:.2f}s CPU" for label, seconds in timings.items())
+    )
+    return mismatches
+
+
+def record(directory: str) -> None:
+    """Save the live feeds configured in rss.py as fixtures."""
+    import rss
+
+    os.makedirs(directory, exist_ok=True)
+    for feed_cfg in rss.FEEDS:
+        kind = rss.feed_handler(feed_cfg).kind
+        resp = rss.HTTP.get(feed_cfg["url"])
+        if resp.status_code != 200:
+            LOG.warning("HTTP %s fetching %s; not recorded", resp.status_code, feed_cfg["url"])
+            continue
+        filename = f"{kind}--{feed_cfg['name'].replace(':', '_')}.xml"
+        with open(os.path.join(directory, filename), "wb") as f:
+            f.write(resp.content)
+        LOG.info("Recorded %s (%d bytes)", filename, len(resp.content))
+
+
+def run(args) -> Dict:
+    fixtures = recorded_fixtures(args.fixtures) if args.fixtures else generated_fixtures(args)
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(args, fixtures, child), daemon=True)
+    server.start()
+    base = parent.recv()
+    del fixtures
+
+    import rss
+
+    state_dir = tempfile.mkdtemp(prefix="rss-bench-")
+    rss.STATE_FILE = os.path.join(state_dir, "legacy.json")
+    rss.STATE_DB_FILE = os.path.join(state_dir, "state.db")
+    rss.STATE_LOG_FILE = os.path.join(state_dir, "state.log")
+    rss.AGGREGATE_DIR = state_dir
+
+    feeds = []
+    for fixture in _control(base, "/_feeds"):
+        kind = fixture["type"]
+        feed_cfg = {
+            "name": fixture["name"],
+            "url": f"{base}/feeds/{fixture['name']}",
+            "type": kind,
+            "webhook_env": f"BENCH_{kind.upper().replace('-', '_')}_WEBHOOK",
+            "default_webhook": f"{base}/webhooks/{kind}",
+        }
+        if kind == "html-article":
+            feed_cfg["preferred_image"] = f"{base}/img/{fixture['name']}/"
+            feed_cfg["aggregate"] = "feeds"
+        elif kind == "youtube":
+            feed_cfg["aggregate"] = "youtube"
+        feeds.append(feed_cfg)
+    rss.compile_feeds(feeds)
+
+    state = rss.load_state()
+    report = {"feeds": len(feeds), "cycles": []}
+    websub = rss.start_websub(None, 0, "127.0.0.1", [feed_cfg["name"] for feed_cfg in feeds]) if args.websub else None
+    try:
+        for cycle in range(args.cycles):
+            batch = feeds
+            if cycle:
+                advanced = _control(base, f"/_advance?new={args.new_entries}&every={args.changed_every}")
+                if websub is not None and report.get("subscriptions"):
+                    names = _wait_for_pushes(websub, advanced["pushed"])
+                    batch = [feed_cfg for feed_cfg in feeds if feed_cfg["name"] in names]
+            server_before = _control(base, "/_stats")
+            http_before = rss.HTTP.stats()
+            rss.STAGES.reset()
+            wall, cpu = time.perf_counter(), time.process_time()
+            results = rss.poll_cycle(state, batch)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if websub is not None and not cycle:
+                websub.subscribe_feeds({feed_cfg["name"]: feed_cfg for feed_cfg in feeds}, results)
+                report["subscriptions"] = _wait_for_subscriptions(base, websub, len(feeds))
+            server_after = _control(base, "/_stats")
+            http_after = rss.HTTP.stats()
+
+            statuses: Dict[str, int] = {}
+            for parsed in results.values():
+                status = "error" if parsed is None else str(parsed.get("status", "error"))
+                statuses[status] = statuses.get(status, 0) + 1
+            received = sum(s["bytes"] for s in http_after.values()) - sum(s["bytes"] for s in http_before.values())
+            delta = {key: server_after.get(key, 0) - server_before.get(key, 0) for key in server_after}
+            report["cycles"].append({
+                "wall": round(wall, 3),
+                "cpu": round(cpu, 3),
+                "statuses": statuses,
+                "stages": {stage: {k: round(v, 3) for k, v in s.items()} for stage, s in sorted(rss.STAGES.stats().items())},
+                "bytes_received": received,
+                "bytes_sent": delta.get("bytes_in", 0),
+                "messages": delta.get("messages", 0),
+                "embeds": delta.get("embeds", 0),
+                "rate_limited": delta.get("rate_limited", 0),
+                "bad_requests": delta.get("bad_requests", 0),
+                "image_requests": delta.get("image_requests", 0),
+            })
+        report["peak_rss_mb"] = peak_rss_mb()
+        if args.save_posts:
+            posts = json.dumps(_control(base, "/_posts"), indent=1, sort_keys=True)
+            with open(args.save_posts, "w", encoding="utf-8") as f:
+                f.write(posts.replace(base, BASE))
+    finally:
+        server.terminate()
+    return report
+
+
+def _wait_for_subscriptions(base: str, websub, expected: int, timeout: float = 30.0) -> int:
+    deadline = time.monotonic() + timeout
+    while True:
+        verified = _control(base, "/_stats").get("websub_verified", 0)
+        if verified >= expected or time.monotonic() > deadline:
+            return sum(1 for name in websub.names if websub.active(name))
+        time.sleep(0.1)
+
+
+def _wait_for_pushes(websub, expected: int, timeout: float = 30.0) -> List[str]:
+    deadline = time.monotonic() + timeout
+    while True:
+        names = websub.pushed()
+        if len(names) >= expected or time.monotonic() > deadline:
+            return names
+        websub.wait(0.1)
+
+
+def print_report(report: Dict) -> None:
+    print(f"{report['feeds']} feeds")
+    if "subscriptions" in report:
+        print(f"{report['subscriptions']} WebSub subscriptions; later cycles process the pushed feeds only")
+    for i, c in enumerate(report["cycles"], 1):
+        statuses = ", ".join(f"{n} x {s}" for s, n in sorted(c["statuses"].items()))
+        print(
+            f"cycle {i}: {c['wall']:.2f}s wall, {c['cpu']:.2f}s CPU; {statuses}; "
+            f"{c['messages']} messages / {c['embeds']} embeds, {c['rate_limited']} rate limited, {c['bad_requests']} rejected; "
+            f"{c['image_requests']} image requests; {c['bytes_received'] / 1e6:.2f} MB in, {c['bytes_sent'] / 1e6:.2f} MB out"
+        )
+        for stage, s in c["stages"].items():
+            print(f"    {stage:<10} {int(s['calls']):>7} calls {s['wall']:>9.3f}s wall {s['cpu']:>9.3f}s CPU")
+    if report.get("peak_rss_mb") is not None:
+        print(f"peak RSS {report['peak_rss_mb']:.1f} MB")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark rss.py poll cycles against local fixtures.")
+    parser.add_argument("--channels", type=int, default=500, help="generated YouTube channel feeds")
+    parser.add_argument("--news-feeds", type=int, default=4, help="generated news feeds")
+    parser.add_argument("--news-entries", type=int, default=1000, help="entries per news feed")
+    parser.add_argument("--comics", type=int, default=2, help="generated comic feeds")
+    parser.add_argument("--generic", type=int, default=2, help="generated generic feeds")
+    parser.add_argument("--fixtures", help="play back feeds saved with --record from this directory")
+    parser.add_argument("--record", metavar="DIR", help="save the live feeds of rss.py to DIR and exit")
+    parser.add_argument("--check-extraction", action="store_true", help="compare entry HTML extraction with the reference and exit")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--new-entries", type=int, default=2, help="entries published per changed feed between cycles")
+    parser.add_argument("--changed-every", type=int, default=10, help="publish new entries on every Nth feed")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of feed requests answered with 503")
+    parser.add_argument("--no-etag", action="store_true", help="do not send ETags (no 304s)")
+    parser.add_argument("--rate-limit", type=int, default=30, help="webhook posts allowed per window (Discord: 5)")
+    parser.add_argument("--rate-window", type=float, default=1.0, help="webhook rate limit window in seconds (Discord: 2)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--websub", action="store_true", help="subscribe at the stand-in hub and deliver new entries by push after cycle 1")
+    parser.add_argument("--save-posts", metavar="FILE", help="write the delivered messages to FILE")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show rss.py's log output")
+    args = parser.parse_args(argv)
+
+    # Configured before rss is imported, which makes its own basicConfig() call a no-op
+    verbose = args.verbose or args.record
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    if args.record:
+        record(args.record)
+        return
+    if args.check_extraction:
+        sys.exit(1 if check_extraction(args.seed) else 0)
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,43 +5,238 @@ Poll xkcd RSS feed and forward new entries to a Discord webhook.
 Usage:
   - Install dependencies: pip install requests feedparser
   - Run: python rss-feed/xkcd_to_discord.py
+  - Or run it from cron / a job scheduler with --once: it polls the feeds that are due, prints a
+    JSON summary (including startup_seconds, the time from start to the first request) and exits
+    with status 1 if a feed failed. requests, feedparser and bs4 are only imported when needed,
+    and only the due feeds' state is loaded. With SHARDING, give each job a stable WORKER_ID so
+    the feeds stay split the same way between runs.
 
 Configuration:
   - Set environment variable XKCD_DISCORD_WEBHOOK to override the webhook URL.
-  - Set POLL_INTERVAL to number of seconds between checks (default 300 seconds).
-
-This script persists the last seen entry links in .xkcd_state.json next to the script.
+  - Set POLL_INTERVAL to number of seconds between checks (default 3600 seconds). Each feed's
+    interval then adapts to how often it publishes, its <ttl>/sy:updatePeriod hints, 304 replies
+    and errors, within MIN_POLL_INTERVAL and MAX_POLL_INTERVAL (default 900 and 21600 seconds).
+  - Set FETCH_WORKERS to the number of feeds fetched in parallel (default 16).
+  - Set PARSE_WORKERS to parse feeds and extract their entries' HTML in that many worker
+    processes instead of the fetching threads (default 0: in-process). If the workers cannot be
+    started or die, parsing continues in-process.
+  - Set HOST_CONCURRENCY to the max parallel requests per host (default 4), and
+    HOST_CONCURRENCY_OVERRIDES to per-host limits, e.g. "www.youtube.com=8,xkcd.com=1".
+  - All requests share one keep-alive connection pool. Set HTTP_POOL_SIZE for the connections kept
+    per host (default 10) and HTTP_POOL_OVERRIDES for per-host sizes; HTTP_RETRIES / HTTP_BACKOFF
+    control retries of feed and image requests; FEED_TIMEOUT, IMAGE_TIMEOUT and WEBHOOK_TIMEOUT
+    are in seconds.
+  - Feeds are read as they stream in and reading stops after STREAM_KNOWN_RUN (default 3)
+    consecutive already-seen entries; only the new entries are parsed. Every FULL_PARSE_EVERY-th
+    fetch (default 24) reads the whole feed. STREAM_PARSE=0 turns this off. Feeds larger than
+    FEED_MAX_BYTES (default 5 MiB) are cut off.
+  - Only the newest FEED_MAX_ENTRIES entries of a feed are used (default 500, 0 = all; a feed's
+    "max_entries" overrides it). Parsed entries are reduced to small records once their messages
+    are prepared. The messages prepared in one cycle may take up to CYCLE_MEMORY_BUDGET bytes
+    (default 128 MiB, 0 = no limit); newer entries beyond that wait for the next poll.
+  - Image validation results are cached in the state store: IMAGE_CACHE_SIZE URLs (default 5000),
+    valid ones for IMAGE_CACHE_TTL seconds (default 7 days) and failures for
+    IMAGE_CACHE_NEGATIVE_TTL seconds (default 1 hour). Uncached images of a cycle are checked
+    concurrently on IMAGE_VALIDATION_WORKERS threads (default 8); an image not validated within
+    IMAGE_VALIDATION_DEADLINE seconds (default 10) is dropped from its message.
+  - New entries are posted in order, up to WEBHOOK_BATCH_SIZE embeds per message (default 10).
+    Discord rate limits are respected; 429s and server errors are retried up to
+    WEBHOOK_MAX_ATTEMPTS times with backoff (WEBHOOK_BACKOFF, WEBHOOK_MAX_BACKOFF seconds).
+  - Set METRICS_PORT to serve Prometheus metrics on http://METRICS_HOST:METRICS_PORT/metrics
+    (METRICS_HOST defaults to 127.0.0.1; a JSON summary is at /metrics.json). A JSON summary is
+    also logged every METRICS_LOG_INTERVAL seconds (default 3600, 0 turns it off).
+  - Set WEBSUB_CALLBACK_URL to the public URL of this script's WebSub callback server (listening
+    on WEBSUB_HOST:WEBSUB_PORT, default 0.0.0.0:8081) to have feeds pushed instead of polled:
+    feeds advertising a hub, and YouTube channels, are subscribed for WEBSUB_LEASE_SECONDS
+    (default 5 days) and renewed before that runs out. Pushed entries are posted right away;
+    subscribed feeds are polled only every WEBSUB_POLL_INTERVAL seconds (default 21600) as a
+    safety net. A feed with "websub": False in its config is never subscribed.
+
+Feeds with an "aggregate" in their config also have their newest entries written to
+<aggregate>.json (feeds.json, youtube.json) in AGGREGATE_DIR (default: next to this script, ""
+turns it off) for index.html and youtube.html, with .gz and, if the brotli module is installed,
+.br copies. Each file holds at most AGGREGATE_MAX_ITEMS items (default 500) and
+AGGREGATE_MAX_PER_FEED per feed (default 50). Aggregate-only feeds need no webhook.
+
+This script persists the seen entry links next to the script, together with each feed's
+ETag/Last-Modified validators so unchanged feeds are answered with a cheap 304. Set STATE_BACKEND
+to "sqlite" (default, .rss_state.db in WAL mode) or "log" (append-only .rss_state.log with
+compaction). An existing .xkcd_state.json from older versions is imported on first start.
+Entries are deduplicated by id/guid (falling back to the link); per feed, at most SEEN_MAX_ENTRIES
+(default 500) are kept, and none that were last seen in the feed more than SEEN_MAX_AGE_DAYS
+(default 90) ago.
+
+Several workers (processes or hosts) can split the feeds between them: set SHARDING=1 and point
+them at the same .rss_state.db (sqlite backend only, on a volume with working file locks). Each
+worker heartbeats in the database and takes a lease on the feeds that rendezvous hashing assigns
+to it; leases last LEASE_TTL seconds (default 120) and are renewed every LEASE_TTL/3, so the feeds
+of a stopped worker move to the others within LEASE_TTL. A feed that rebalancing moves to another
+worker is handed over once the poll cycle it is in has been delivered, and a worker that lost a
+feed's lease during a poll (e.g. stalled past LEASE_TTL) does not deliver it. WORKER_ID names the
+worker (default hostname-pid).
 """
 
 from __future__ import annotations
 
+import time
+
+STARTED = time.monotonic()  # before the imports, for the startup time metric
+
+import calendar
+import gzip
+import hashlib
+import heapq
+import hmac
+import importlib
 import json
 import logging
 import os
+import pickle
+import random
 import re
+import secrets
+import socket
+import sqlite3
 import sys
-import time
-from typing import Dict, List, Optional, Tuple
+import threading
+import xml.parsers.expat
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, quote, unquote, urljoin, urlsplit
+from html import escape, unescape
+
+if TYPE_CHECKING:
+    # Imported where they are used, to keep startup fast
+    from concurrent.futures import ProcessPoolExecutor
+    from http.server import ThreadingHTTPServer
+
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+
+class _LazyModule:
+    """A module that is only imported when one of its attributes is first used.
+
+    requests, feedparser and bs4 take most of the startup time, and a --once run whose feeds are
+    not due needs none of them.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
 
-import feedparser
-import requests
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
-from html import unescape
+    def __getattr__(self, attr: str):
+        return getattr(importlib.import_module(self._name), attr)
+
+
+feedparser = _LazyModule("feedparser")
+requests = _LazyModule("requests")
+
+try:
+    import brotli
+except ImportError:  # optional: only used for the precompressed .br aggregates
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared aggregates are written without a file lock
+    fcntl = None
 
 LOG = logging.getLogger("xkcd_to_discord")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 # Configuration
-POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", "3600"))  # seconds
+POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", "3600"))  # seconds, until a feed's rate is learned
+MIN_POLL_INTERVAL = int(os.environ.get("MIN_POLL_INTERVAL", "900"))
+MAX_POLL_INTERVAL = int(os.environ.get("MAX_POLL_INTERVAL", "21600"))
+SCHEDULE_WINDOW = float(os.environ.get("SCHEDULE_WINDOW", "5"))  # feeds due this close together share a cycle
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "16"))  # feeds fetched in parallel
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0"))  # processes parsing feeds; 0 = parse in-process
+HOST_CONCURRENCY = int(os.environ.get("HOST_CONCURRENCY", "4"))  # parallel requests per host
+
+
+def _parse_host_map(spec: str) -> Dict[str, int]:
+    """Parse "host=N,host2=M" into a dict, ignoring malformed items."""
+    out: Dict[str, int] = {}
+    for item in spec.split(","):
+        host, _, value = item.strip().partition("=")
+        if host and value.strip().isdigit():
+            out[host.strip().lower()] = int(value)
+    return out
+
+
+# e.g. "www.youtube.com=8,xkcd.com=1"
+HOST_CONCURRENCY_OVERRIDES = _parse_host_map(os.environ.get("HOST_CONCURRENCY_OVERRIDES", ""))
+
+# HTTP transport
+FEED_TIMEOUT = float(os.environ.get("FEED_TIMEOUT", "10"))  # seconds
+IMAGE_TIMEOUT = float(os.environ.get("IMAGE_TIMEOUT", "6"))
+WEBHOOK_TIMEOUT = float(os.environ.get("WEBHOOK_TIMEOUT", "15"))
+FEED_MAX_BYTES = int(os.environ.get("FEED_MAX_BYTES", str(5 * 1024 * 1024)))  # larger feeds are cut off
+FEED_MAX_ENTRIES = int(os.environ.get("FEED_MAX_ENTRIES", "500"))  # newest entries used per feed, 0 = all
+CYCLE_MEMORY_BUDGET = int(os.environ.get("CYCLE_MEMORY_BUDGET", str(128 * 1024 * 1024)))  # bytes, 0 = no limit
+STREAM_PARSE = os.environ.get("STREAM_PARSE", "1") != "0"  # stop reading feeds at known entries
+STREAM_KNOWN_RUN = int(os.environ.get("STREAM_KNOWN_RUN", "3"))  # consecutive known entries that end a read
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_DRAIN_BYTES = 256 * 1024  # read up to this much past the stop point to keep the connection
+FULL_PARSE_EVERY = int(os.environ.get("FULL_PARSE_EVERY", "24"))  # every Nth fetch reads the whole feed
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", "10"))  # embeds per Discord message (max 10)
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "5"))  # tries per message on 429/5xx
+WEBHOOK_BACKOFF = float(os.environ.get("WEBHOOK_BACKOFF", "1"))  # seconds, doubled per attempt
+WEBHOOK_MAX_BACKOFF = float(os.environ.get("WEBHOOK_MAX_BACKOFF", "60"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))  # retries for idempotent requests
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.5"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", str(max(10, HOST_CONCURRENCY))))  # keep-alive connections per host
+HTTP_POOL_OVERRIDES = _parse_host_map(os.environ.get("HTTP_POOL_OVERRIDES", "www.youtube.com=16,discord.com=4"))
+
+# Image validation cache
+IMAGE_CACHE_SIZE = int(os.environ.get("IMAGE_CACHE_SIZE", "5000"))  # URLs
+IMAGE_CACHE_TTL = float(os.environ.get("IMAGE_CACHE_TTL", str(7 * 86400)))  # seconds a valid image is trusted
+IMAGE_CACHE_NEGATIVE_TTL = float(os.environ.get("IMAGE_CACHE_NEGATIVE_TTL", "3600"))  # seconds a failure is remembered
+IMAGE_VALIDATION_WORKERS = int(os.environ.get("IMAGE_VALIDATION_WORKERS", "8"))  # images checked in parallel
+IMAGE_VALIDATION_DEADLINE = float(os.environ.get("IMAGE_VALIDATION_DEADLINE", "10"))  # seconds per image
+
+# Metrics
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))  # serve /metrics on this port; 0 = off
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_LOG_INTERVAL = float(os.environ.get("METRICS_LOG_INTERVAL", "3600"))  # seconds between JSON lines; 0 = off
+WEBSUB_CALLBACK_URL = os.environ.get("WEBSUB_CALLBACK_URL", "")  # public base URL of the callback server; "" = off
+WEBSUB_HOST = os.environ.get("WEBSUB_HOST", "0.0.0.0")
+WEBSUB_PORT = int(os.environ.get("WEBSUB_PORT", "8081"))
+WEBSUB_LEASE_SECONDS = int(os.environ.get("WEBSUB_LEASE_SECONDS", str(5 * 86400)))
+WEBSUB_POLL_INTERVAL = float(os.environ.get("WEBSUB_POLL_INTERVAL", "21600"))  # safety-net polls of subscribed feeds
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-STATE_FILE = os.path.join(BASE_DIR, ".xkcd_state.json")
+STATE_FILE = os.path.join(BASE_DIR, ".xkcd_state.json")  # legacy JSON state, migrated on first start
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "sqlite")
+STATE_DB_FILE = os.path.join(BASE_DIR, ".rss_state.db")
+STATE_LOG_FILE = os.path.join(BASE_DIR, ".rss_state.log")
+SEEN_MAX_ENTRIES = int(os.environ.get("SEEN_MAX_ENTRIES", "500"))  # per feed, never below the feed's size
+SEEN_MAX_AGE_DAYS = float(os.environ.get("SEEN_MAX_AGE_DAYS", "90"))  # since last observed in the feed
+
+# Aggregated JSON for index.html / youtube.html
+AGGREGATE_DIR = os.environ.get("AGGREGATE_DIR", BASE_DIR)  # "" turns the aggregates off
+AGGREGATE_MAX_ITEMS = int(os.environ.get("AGGREGATE_MAX_ITEMS", "500"))  # per file
+AGGREGATE_MAX_PER_FEED = int(os.environ.get("AGGREGATE_MAX_PER_FEED", "50"))
+AGGREGATE_MAX_DESCRIPTION = 2000  # characters; longer HTML descriptions are reduced to plain text
+SHARDING = os.environ.get("SHARDING", "0") == "1"  # split the feeds with other workers sharing STATE_DB_FILE
+WORKER_ID = os.environ.get("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+LEASE_TTL = float(os.environ.get("LEASE_TTL", "120"))  # seconds a feed lease / worker heartbeat lasts
+STATE_LOCK = threading.RLock()
+
+_HOST_SEMAPHORES: Dict[str, threading.BoundedSemaphore] = {}
+_POLLS_SINCE_FULL: Dict[str, int] = {}  # feed name -> fetches since it was last read whole, see fetch_feed()
+_PARSE_PROFILES: Dict[str, Dict] = {}  # feed name -> parse profile, see parse_feed_body()
+_HOST_SEMAPHORES_LOCK = threading.Lock()
 
 FEEDS = [
     {
         "name": "xkcd",
         "url": "https://xkcd.com/rss.xml",
+        "type": "comic",
         "webhook_env": "XKCD_DISCORD_WEBHOOK",
         "default_webhook": "https://discord.com/api/webhooks/1436404104493666486/LG7HPvZBrC1uB_jgSQHahpuguxBMLC7ZIOkRFlcVzFKs2m6gBBTh8H35NmclOn-WPeeF",
     },
@@ -57,7 +252,24 @@ FEEDS = [
         "url": "https://thespinoff.co.nz/feed/",
         "webhook_env": "SPINOFF_DISCORD_WEBHOOK",
         "default_webhook": "https://discord.com/api/webhooks/1436415431241105408/TjQEengj_0kEsGGHSJ_R8faPwYf0POzvxqzcqs6-pNupJXWZ-60j4YPjxT9L3Dh-HUUT",
-        "clean_html": True,
+        "type": "html-article",
+        "preferred_image": "https://images.thespinoff.co.nz",
+    },
+    # Only shown on index.html, through feeds.json
+    {
+        "name": "rnz",
+        "url": "https://www.rnz.co.nz/rss/national.xml",
+        "aggregate": "feeds",
+    },
+    {
+        "name": "stuff",
+        "url": "https://www.stuff.co.nz/rss",
+        "aggregate": "feeds",
+    },
+    {
+        "name": "nzherald",
+        "url": "https://www.nzherald.co.nz/arc/outboundfeeds/rss/curated/78/?outputType=xml&_website=nzh",
+        "aggregate": "feeds",
     },
 ]
 YOUTUBE_CHANNEL_IDS = [
@@ -119,41 +331,669 @@ for ch in YOUTUBE_CHANNEL_IDS:
         "url": f"https://www.youtube.com/feeds/videos.xml?channel_id={ch}",
         "webhook_env": "YOUTUBE_DISCORD_WEBHOOK",
         "default_webhook": "https://discord.com/api/webhooks/1436420445065707520/YswjSscfNtWxq6injmBm4v0M0xvf3H8dz6KGM-8JTAdWiE_WNZKbU1EHqzfv2b_8zVUS",
-        "clean_html": False,
+        "type": "youtube",
+        "aggregate": "youtube",
     })
 
 
 def webhook_for_feed(feed_cfg: Dict) -> Optional[str]:
-    return os.environ.get(feed_cfg.get("webhook_env")) or feed_cfg.get("default_webhook")
+    env = feed_cfg.get("webhook_env")
+    return (os.environ.get(env) if env else None) or feed_cfg.get("default_webhook")
 
 
-def load_state() -> Dict[str, Dict[str, List[str]]]:
-    if not os.path.exists(STATE_FILE):
-        return {"feeds": {}}
-    try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        LOG.exception("Failed to read state file, starting fresh")
-        return {"feeds": {}}
+class StateStore:
+    """Persistent seen-entry and per-feed metadata store.
 
+    Every change is committed on its own (one seen entry or one metadata value at a time), so a
+    crash never loses or corrupts more than the write in flight. `load()` returns the raw view the
+    poll loop builds on: {"feeds": {name: {key: seen_at}}, "http": {name: validators}}.
+    """
 
-def save_state(state: Dict[str, Dict[str, List[str]]]) -> None:
-    try:
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f, indent=2)
-    except Exception:
-        LOG.exception("Failed to save state")
+    def load(self) -> Dict:
+        raise NotImplementedError
+
+    def add_seen(self, feed: str, key: str, ts: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def forget_seen(self, feed: str, keys: List[str]) -> None:
+        raise NotImplementedError
+
+    def get_feed_meta(self, feed: str, key: str):
+        """Return a value stored with set_feed_meta(), or None."""
+        raise NotImplementedError
+
+    def set_feed_meta(self, feed: str, key: str, value) -> None:
+        """Store a JSON-serialisable value for a feed; None removes it."""
+        raise NotImplementedError
+
+    def feed_meta_items(self, feed: str) -> Dict[str, object]:
+        """Return every value stored for `feed` with set_feed_meta(), by key."""
+        raise NotImplementedError
+
+    def set_feed_meta_many(self, feed: str, values: Dict[str, object]) -> None:
+        """set_feed_meta() for several keys of a feed in one write."""
+        for key, value in values.items():
+            self.set_feed_meta(feed, key, value)
+
+    def load_feed(self, feed: str) -> Tuple[Dict[str, float], Optional[Dict]]:
+        """Return one feed's {key: seen_at} and HTTP validators as currently committed."""
+        state = self.load()
+        return state["feeds"].get(feed, {}), state["http"].get(feed)
+
+    def is_empty(self) -> bool:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def import_legacy_json(self, path: str) -> None:
+        """Import the pre-store .xkcd_state.json format, including the legacy top-level "seen" key."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            LOG.exception("Failed to read legacy state file %s; nothing migrated", path)
+            return
+        feeds: Dict[str, List[str]] = {name: list(links) for name, links in (legacy.get("feeds") or {}).items()}
+        # The single-feed version of this script kept xkcd's links in a top-level "seen" list
+        if legacy.get("seen"):
+            feeds.setdefault("xkcd", [])
+            feeds["xkcd"] += [link for link in legacy["seen"] if link not in feeds["xkcd"]]
+        now = time.time()
+        count = 0
+        for name, links in feeds.items():
+            for i, link in enumerate(links):
+                # Keep the legacy list order in the timestamps
+                self.add_seen(name, link, now - len(links) + i)
+                count += 1
+        for name, validators in (legacy.get("http") or {}).items():
+            self.set_feed_meta(name, "http", validators)
+        LOG.info("Migrated %d seen entries of %d feeds from %s", count, len(feeds), path)
+
+
+class SqliteStateStore(StateStore):
+    """State in a SQLite database in WAL mode; each change is a single-row autocommit write."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " feed TEXT NOT NULL, key TEXT NOT NULL, seen_at REAL NOT NULL,"
+            " PRIMARY KEY (feed, key)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS feed_meta ("
+            " feed TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (feed, key)) WITHOUT ROWID"
+        )
+
+    def load(self) -> Dict:
+        state: Dict = {"feeds": {}, "http": {}}
+        with self._lock:
+            for feed, key, seen_at in self._db.execute("SELECT feed, key, seen_at FROM seen ORDER BY feed, seen_at"):
+                state["feeds"].setdefault(feed, {})[key] = seen_at
+            for feed, value in self._db.execute("SELECT feed, value FROM feed_meta WHERE key = 'http'"):
+                state["http"][feed] = json.loads(value)
+        return state
+
+    def load_feed(self, feed: str) -> Tuple[Dict[str, float], Optional[Dict]]:
+        with self._lock:
+            seen = dict(self._db.execute("SELECT key, seen_at FROM seen WHERE feed = ? ORDER BY seen_at", (feed,)))
+            row = self._db.execute("SELECT value FROM feed_meta WHERE feed = ? AND key = 'http'", (feed,)).fetchone()
+        return seen, json.loads(row[0]) if row else None
+
+    def add_seen(self, feed: str, key: str, ts: Optional[float] = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO seen (feed, key, seen_at) VALUES (?, ?, ?)",
+                (feed, key, time.time() if ts is None else ts),
+            )
+
+    def forget_seen(self, feed: str, keys: List[str]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM seen WHERE feed = ? AND key = ?", [(feed, key) for key in keys])
+            self._db.execute("COMMIT")
+
+    def get_feed_meta(self, feed: str, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM feed_meta WHERE feed = ? AND key = ?", (feed, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_feed_meta(self, feed: str, key: str, value) -> None:
+        with self._lock:
+            if value is None:
+                self._db.execute("DELETE FROM feed_meta WHERE feed = ? AND key = ?", (feed, key))
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO feed_meta (feed, key, value) VALUES (?, ?, ?)",
+                    (feed, key, json.dumps(value)),
+                )
+
+    def feed_meta_items(self, feed: str) -> Dict[str, object]:
+        with self._lock:
+            return {key: json.loads(value) for key, value in self._db.execute("SELECT key, value FROM feed_meta WHERE feed = ?", (feed,))}
+
+    def set_feed_meta_many(self, feed: str, values: Dict[str, object]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM feed_meta WHERE feed = ? AND key = ?", [(feed, key) for key, value in values.items() if value is None])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO feed_meta (feed, key, value) VALUES (?, ?, ?)",
+                [(feed, key, json.dumps(value)) for key, value in values.items() if value is not None],
+            )
+            self._db.execute("COMMIT")
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not any(self._db.execute("SELECT 1 FROM seen UNION ALL SELECT 1 FROM feed_meta LIMIT 1").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class LogStateStore(StateStore):
+    """State as an append-only JSON-lines log, compacted into a fresh file once it grows.
+
+    Each change appends (and fsyncs) one line. A torn last line from a crash is skipped on load.
+    Compaction writes the live records to a temporary file and atomically renames it over the log.
+    """
+
+    def __init__(self, path: str, compact_min: int = 1000):
+        self.path = path
+        self.compact_min = compact_min
+        self._lock = threading.Lock()
+        self._seen: Dict[str, Dict[str, float]] = {}
+        self._meta: Dict[str, Dict[str, object]] = {}
+        self._records = 0
+        torn = False
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        LOG.warning("Skipping corrupt state log record in %s", path)
+                    self._records += 1
+                    torn = not line.endswith("\n")
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            # Terminate a half-written last record so the next append starts on its own line
+            self._file.write("\n")
+
+    def _apply(self, rec: Dict) -> None:
+        if rec["op"] == "seen":
+            self._seen.setdefault(rec["feed"], {}).setdefault(rec["key"], rec["ts"])
+        elif rec["op"] == "forget":
+            for key in rec["keys"]:
+                self._seen.get(rec["feed"], {}).pop(key, None)
+        elif rec["op"] == "meta":
+            self._apply_meta(rec["feed"], rec["key"], rec["value"])
+        elif rec["op"] == "metas":
+            for key, value in rec["values"].items():
+                self._apply_meta(rec["feed"], key, value)
+
+    def _apply_meta(self, feed: str, key: str, value) -> None:
+        if value is None:
+            self._meta.get(feed, {}).pop(key, None)
+        else:
+            self._meta.setdefault(feed, {})[key] = value
+
+    def _append(self, rec: Dict) -> None:
+        self._apply(rec)
+        self._file.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._records += 1
+        if self._records > max(self.compact_min, 2 * self._live_records()):
+            self._compact()
+
+    def _live_records(self) -> int:
+        return sum(len(v) for v in self._seen.values()) + sum(len(v) for v in self._meta.values())
+
+    def _compact(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for feed, keys in self._seen.items():
+                for key, ts in keys.items():
+                    f.write(json.dumps({"op": "seen", "feed": feed, "key": key, "ts": ts}, separators=(",", ":")) + "\n")
+            for feed, meta in self._meta.items():
+                for key, value in meta.items():
+                    f.write(json.dumps({"op": "meta", "feed": feed, "key": key, "value": value}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._records = self._live_records()
+        LOG.debug("Compacted state log %s to %d records", self.path, self._records)
+
+    def load(self) -> Dict:
+        with self._lock:
+            return {
+                "feeds": {feed: dict(keys) for feed, keys in self._seen.items()},
+                "http": {feed: meta["http"] for feed, meta in self._meta.items() if "http" in meta},
+            }
+
+    def add_seen(self, feed: str, key: str, ts: Optional[float] = None) -> None:
+        with self._lock:
+            if key not in self._seen.get(feed, {}):
+                self._append({"op": "seen", "feed": feed, "key": key, "ts": time.time() if ts is None else ts})
+
+    def forget_seen(self, feed: str, keys: List[str]) -> None:
+        with self._lock:
+            keys = [key for key in keys if key in self._seen.get(feed, {})]
+            if keys:
+                self._append({"op": "forget", "feed": feed, "keys": keys})
+
+    def get_feed_meta(self, feed: str, key: str):
+        with self._lock:
+            return self._meta.get(feed, {}).get(key)
+
+    def set_feed_meta(self, feed: str, key: str, value) -> None:
+        with self._lock:
+            if self._meta.get(feed, {}).get(key) != value:
+                self._append({"op": "meta", "feed": feed, "key": key, "value": value})
+
+    def feed_meta_items(self, feed: str) -> Dict[str, object]:
+        with self._lock:
+            return dict(self._meta.get(feed, {}))
+
+    def set_feed_meta_many(self, feed: str, values: Dict[str, object]) -> None:
+        with self._lock:
+            meta = self._meta.get(feed, {})
+            values = {key: value for key, value in values.items() if meta.get(key) != value}
+            if values:
+                self._append({"op": "metas", "feed": feed, "values": values})
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not self._seen and not self._meta
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+STATE_BACKENDS = {
+    "sqlite": lambda: SqliteStateStore(STATE_DB_FILE),
+    "log": lambda: LogStateStore(STATE_LOG_FILE),
+}
+
+_STORE: Optional[StateStore] = None
+
+
+def get_store() -> StateStore:
+    """Open the configured state backend once, migrating the legacy JSON state file into it."""
+    global _STORE
+    with STATE_LOCK:
+        if _STORE is None:
+            if STATE_BACKEND not in STATE_BACKENDS:
+                raise ValueError(f"Unknown STATE_BACKEND {STATE_BACKEND!r}, expected one of {sorted(STATE_BACKENDS)}")
+            store = STATE_BACKENDS[STATE_BACKEND]()
+            if store.is_empty() and os.path.exists(STATE_FILE):
+                store.import_legacy_json(STATE_FILE)
+            _STORE = store
+        return _STORE
+
+
+class SeenIndex:
+    """In-memory index of handled entries per feed, kept across poll cycles.
+
+    Keys are entry ids/guids (falling back to the link); lookups also accept the link so state
+    written by older versions, which stored links only, keeps matching until `rekey()` moves such
+    an entry to its id. Each feed's keys are ordered by when they were last observed in the feed,
+    which is what retention works on: keys beyond `max_entries` or not observed for `max_age`
+    seconds are pruned, both here and in the state store.
+    """
+
+    def __init__(self, seen: Optional[Dict[str, Dict[str, float]]] = None, max_entries: int = 500, max_age: float = 90 * 86400):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._feeds: Dict[str, OrderedDict] = {}
+        for feed, keys in (seen or {}).items():
+            self._feeds[feed] = OrderedDict(sorted(keys.items(), key=lambda kv: kv[1]))
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._feeds.values())
+
+    def feeds(self) -> List[str]:
+        return list(self._feeds)
+
+    def count(self, feed: str) -> int:
+        return len(self._feeds.get(feed, ()))
+
+    def keys(self, feed: str) -> List[str]:
+        return list(self._feeds.get(feed, ()))
+
+    def replace(self, feed: str, keys: Dict[str, float]) -> None:
+        """Set a feed's keys to `keys` ({key: last observed}), e.g. as reloaded from the store."""
+        if keys:
+            self._feeds[feed] = OrderedDict(sorted(keys.items(), key=lambda kv: kv[1]))
+        else:
+            self._feeds.pop(feed, None)
+
+    def contains(self, feed: str, *keys: Optional[str]) -> bool:
+        seen = self._feeds.get(feed)
+        return bool(seen) and any(key and key in seen for key in keys)
+
+    def add(self, feed: str, key: str, ts: Optional[float] = None) -> None:
+        seen = self._feeds.setdefault(feed, OrderedDict())
+        seen[key] = time.time() if ts is None else ts
+        seen.move_to_end(key)
+
+    def rekey(self, feed: str, old: str, new: str) -> bool:
+        """Move a seen entry from key `old` (e.g. a legacy link key) to `new`; return whether it moved."""
+        seen = self._feeds.get(feed)
+        if not seen or old not in seen or new in seen:
+            return False
+        seen[new] = seen.pop(old)
+        return True
+
+    def observe(self, feed: str, keys: List[str], ts: Optional[float] = None) -> None:
+        """Mark keys (already known ones only) as still present in the feed."""
+        seen = self._feeds.get(feed)
+        if not seen:
+            return
+        now = time.time() if ts is None else ts
+        for key in keys:
+            if key in seen:
+                seen[key] = now
+                seen.move_to_end(key)
+
+    def prune(self, feed: str, keep: int = 0, now: Optional[float] = None) -> List[str]:
+        """Drop keys beyond the retention limits (never fewer than `keep`) and return them."""
+        seen = self._feeds.get(feed)
+        if not seen:
+            return []
+        cutoff = (time.time() if now is None else now) - self.max_age
+        limit = max(self.max_entries, keep)
+        removed: List[str] = []
+        while len(seen) > keep:
+            key, ts = next(iter(seen.items()))
+            if len(seen) <= limit and ts >= cutoff:
+                break
+            seen.popitem(last=False)
+            removed.append(key)
+        if not seen:
+            del self._feeds[feed]
+        return removed
+
+
+def entry_key(entry) -> Optional[str]:
+    """Stable dedup key of an entry: its id/guid, or its link when the feed has no ids."""
+    return entry.get("id") or entry.get("guid") or entry.get("link")
+
+
+def entry_timestamp(entry) -> Optional[int]:
+    """The entry's published (else updated) time as a Unix timestamp, or None."""
+    t = entry.get("published_parsed") or entry.get("updated_parsed")
+    return calendar.timegm(t) if t else None
+
+
+class EntryRecord:
+    """What the rest of a poll cycle needs of a parsed entry once its feed was prepared.
+
+    feedparser's entries carry the full HTML content, *_detail dicts, links and media; holding
+    them for every feed until the cycle ends dominated memory. `aggregate` is the entry's item for
+    FeedAggregate, for feeds that write one.
+    """
+
+    __slots__ = ("key", "link", "title", "published", "aggregate")
+
+    def __init__(self, key: Optional[str], link: Optional[str], title: Optional[str], published: Optional[int], aggregate: Optional[Dict] = None):
+        self.key = key
+        self.link = link
+        self.title = title
+        self.published = published
+        self.aggregate = aggregate
+
+    @classmethod
+    def from_entry(cls, entry, handler: Optional[FeedHandler] = None) -> EntryRecord:
+        return cls(
+            entry_key(entry),
+            entry.get("link"),
+            entry.get("title"),
+            entry_timestamp(entry),
+            handler.aggregate_item(entry) if handler is not None else None,
+        )
+
+
+class ShardCoordinator:
+    """Splits the feeds between worker processes that share one SQLite state database.
+
+    Every worker heartbeats into a `workers` table. Among the workers seen within `ttl` seconds,
+    each feed belongs to the one ranked highest by rendezvous hashing (so a worker joining or
+    leaving only moves its share of the feeds), and a worker polls a feed only while it holds
+    the feed's lease. sync() renews the leases of the feeds this worker should own, takes over
+    expired or released ones and releases those that now belong to someone else, except the
+    feeds between hold() and release() (a poll cycle in progress), which it keeps renewing until
+    their entries are delivered. The leases of a worker that died run out after `ttl`, after
+    which the survivors pick its feeds up.
+
+    A lease carries a fencing token that increases whenever the feed changes owner. owns()
+    checks the token against the database, so a worker that was paused past its lease cannot
+    post entries the feed's new owner (which reloads the feed's seen entries when it takes
+    over) posts as well.
+    """
+
+    def __init__(self, path: str, worker: str, ttl: float):
+        self.worker = worker
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, int] = {}
+        self._changes: Dict[str, bool] = {}
+        self._held: Set[str] = set()
+        self._feeds: List[str] = []
+        self._stopped = threading.Event()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS workers (worker TEXT PRIMARY KEY, heartbeat REAL NOT NULL) WITHOUT ROWID")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " feed TEXT PRIMARY KEY, worker TEXT NOT NULL, expires REAL NOT NULL, token INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    @staticmethod
+    def _rank(worker: str, feed: str) -> bytes:
+        return hashlib.sha1(f"{worker}\0{feed}".encode("utf-8")).digest()
+
+    def owner(self, feed: str, workers: List[str]) -> Optional[str]:
+        """The worker among `workers` that `feed` belongs to."""
+        return max(workers, key=lambda worker: self._rank(worker, feed)) if workers else None
+
+    def sync(self, feeds: List[str], now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """Heartbeat and rebalance; return the feeds (acquired, lost) since the previous sync."""
+        now = time.time() if now is None else now
+        expires = now + self.ttl
+        acquired, lost = [], []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR REPLACE INTO workers (worker, heartbeat) VALUES (?, ?)", (self.worker, now))
+                self._db.execute("DELETE FROM workers WHERE heartbeat < ?", (now - 10 * self.ttl,))
+                workers = [row[0] for row in self._db.execute("SELECT worker FROM workers WHERE heartbeat >= ?", (now - self.ttl,))]
+                leases = {row[0]: row[1:] for row in self._db.execute("SELECT feed, worker, expires, token FROM leases")}
+                for feed in feeds:
+                    holder, lease_expires, token = leases.get(feed, (None, 0.0, 0))
+                    mine = holder == self.worker and lease_expires > now
+                    # A lease still held elsewhere is released by its holder on its next sync. Released
+                    # leases are expired rather than deleted, so their token keeps increasing
+                    taken = holder not in (None, self.worker) and lease_expires > now
+                    if self.owner(feed, workers) == self.worker and not taken:
+                        if not mine:
+                            token += 1
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO leases (feed, worker, expires, token) VALUES (?, ?, ?, ?)",
+                            (feed, self.worker, expires, token),
+                        )
+                        if self._tokens.get(feed) != token:
+                            acquired.append(feed)
+                        self._tokens[feed] = token
+                        continue
+                    if mine and feed in self._held:
+                        # Still being delivered: the new owner takes over once release() hands it on
+                        self._db.execute("UPDATE leases SET expires = ? WHERE feed = ? AND worker = ?", (expires, feed, self.worker))
+                        continue
+                    if mine:
+                        self._db.execute("UPDATE leases SET expires = 0 WHERE feed = ? AND worker = ?", (feed, self.worker))
+                    if self._tokens.pop(feed, None) is not None:
+                        lost.append(feed)
+                for feed in set(self._tokens) - set(feeds) - self._held:
+                    self._db.execute("UPDATE leases SET expires = 0 WHERE feed = ? AND worker = ?", (feed, self.worker))
+                    del self._tokens[feed]
+                    lost.append(feed)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        METRICS.set("rss_owned_feeds", len(self._tokens), worker=self.worker)
+        if acquired or lost:
+            LOG.info("Shard %s: %d feeds across %d workers, took over %d, handed off %d", self.worker, len(self._tokens), len(workers), len(acquired), len(lost))
+        return acquired, lost
+
+    def start(self, feeds: List[str], interval: float) -> None:
+        """Sync now and then every `interval` seconds on a background thread, so leases are renewed
+        even while a long poll cycle runs. The resulting ownership changes are read with changes()."""
+        self._feeds = list(feeds)
+
+        def run() -> None:
+            while not self._stopped.wait(interval):
+                try:
+                    self._record()
+                except Exception:
+                    LOG.exception("Shard sync failed; leases are renewed on the next attempt")
+
+        self._record()
+        threading.Thread(target=run, name="shard-sync", daemon=True).start()
+
+    def _record(self) -> None:
+        acquired, lost = self.sync(self._feeds)
+        with self._lock:
+            self._changes.update({feed: False for feed in lost})
+            self._changes.update({feed: True for feed in acquired})
+
+    def hold(self, feeds: List[str]) -> None:
+        """Keep the leases on `feeds` while they are polled and delivered, even if they are
+        reassigned meanwhile."""
+        with self._lock:
+            self._held.update(feeds)
+
+    def release(self, feeds: List[str]) -> None:
+        """End hold() once the feeds' entries are delivered, handing reassigned ones over now."""
+        with self._lock:
+            held = bool(self._held & set(feeds))
+            self._held.difference_update(feeds)
+        if held and not self._stopped.is_set():
+            try:
+                self._record()
+            except Exception:
+                LOG.exception("Shard sync failed; leases are renewed on the next attempt")
+
+    def changes(self) -> Dict[str, bool]:
+        """Return and clear {feed: owned} for the feeds whose ownership changed since the last call."""
+        with self._lock:
+            changes, self._changes = self._changes, {}
+        return changes
+
+    def owned(self) -> List[str]:
+        with self._lock:
+            return list(self._tokens)
+
+    def owns(self, feed: str) -> bool:
+        """Check against the database that this worker still holds the lease it last took on `feed`."""
+        with self._lock:
+            token = self._tokens.get(feed)
+            if token is None:
+                return False
+            row = self._db.execute(
+                "SELECT 1 FROM leases WHERE feed = ? AND worker = ? AND token = ? AND expires > ?",
+                (feed, self.worker, token, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def close(self, leave: bool = True) -> None:
+        """Hand every feed back and, with `leave`, leave, so the other workers take over without
+        waiting for the TTL. A --once run with a stable WORKER_ID stays listed until its heartbeat
+        expires, so the next run of each worker finds the same set of workers."""
+        self._stopped.set()
+        with self._lock:
+            self._db.execute("UPDATE leases SET expires = 0 WHERE worker = ?", (self.worker,))
+            if leave:
+                self._db.execute("DELETE FROM workers WHERE worker = ?", (self.worker,))
+            self._tokens.clear()
+            self._held.clear()
+            self._db.close()
+
+
+def reload_feed_state(state: Dict, name: str) -> None:
+    """Replace a feed's in-memory seen entries and validators with what the store has committed."""
+    seen, validators = get_store().load_feed(name)
+    with STATE_LOCK:
+        state["feeds"].replace(name, seen)
+        if validators:
+            state.setdefault("http", {})[name] = validators
+        else:
+            state.setdefault("http", {}).pop(name, None)
+        _POLLS_SINCE_FULL.pop(name, None)
+        _PARSE_PROFILES.pop(name, None)
+
+
+def load_state(feeds: Optional[List[str]] = None) -> Dict:
+    """Load the seen entries and HTTP validators of every feed, or only of `feeds`."""
+    if feeds is None:
+        state = get_store().load()
+    else:
+        state = {"feeds": {}, "http": {}}
+        for name in feeds:
+            seen, validators = get_store().load_feed(name)
+            state["feeds"][name] = seen
+            if validators:
+                state["http"][name] = validators
+    state["feeds"] = SeenIndex(state.get("feeds"), max_entries=SEEN_MAX_ENTRIES, max_age=SEEN_MAX_AGE_DAYS * 86400)
+    return state
+
+
+def mark_seen(state: Dict, name: str, key: str) -> None:
+    """Record a handled entry in memory and commit it to the state store."""
+    with STATE_LOCK:
+        state["feeds"].add(name, key)
+        get_store().add_seen(name, key)
+
+
+def prune_seen(state: Dict, name: str, keep: int = 0) -> None:
+    """Apply the seen-entry retention to one feed and drop the pruned keys from the store."""
+    with STATE_LOCK:
+        removed = state["feeds"].prune(name, keep=keep)
+        if removed:
+            get_store().forget_seen(name, removed)
+            LOG.debug("Pruned %d seen entries of %s", len(removed), name)
 
 
 IMG_RE = re.compile(r"<img[^>]+src=[\"']([^\"']+)[\"']", re.I)
+NOSCRIPT_RE = re.compile(r"<noscript", re.I)
 
 
-def extract_all_images(entry) -> List[str]:
-    """Return a list of image URLs found in the entry from several common locations.
+def _entry_html(entry) -> str:
+    """Return the HTML body of the entry: the first content[] value, if any."""
+    if hasattr(entry, "content") and entry.content:
+        try:
+            return entry.content[0].value
+        except Exception:
+            return ""
+    return ""
 
-    Order is roughly: media_thumbnail, media_content, enclosures/links, images in HTML content/summary,
-    and images inside <noscript> fallbacks.
+
+def _metadata_images(entry, scanned: List[str]) -> List[str]:
+    """Images from media_thumbnail, media_content, content[] HTML, enclosures and links.
+
+    HTML strings that were scanned for <img> tags are appended to `scanned`.
     """
     imgs: List[str] = []
 
@@ -202,6 +1042,7 @@ def extract_all_images(entry) -> List[str]:
                 if val and (t is None or "html" in (t or "")):
                     for m in IMG_RE.findall(val):
                         imgs.append(m)
+                    scanned.append(val)
     except Exception:
         pass
 
@@ -222,65 +1063,19 @@ def extract_all_images(entry) -> List[str]:
     except Exception:
         pass
 
-    # 3) HTML content: content[] then summary
-    html = ""
-    if hasattr(entry, "content") and entry.content:
-        try:
-            html = entry.content[0].value
-        except Exception:
-            html = ""
-    if not html and entry.get("summary"):
-        html = entry.get("summary", "")
-    if html:
-        for m in IMG_RE.findall(html):
-            imgs.append(m)
-
-    # 4) noscript fallbacks
-    try:
-        soup = BeautifulSoup(html, "html.parser") if html else None
-        if soup:
-            nos = soup.find("noscript")
-            if nos:
-                try:
-                    nsoup = BeautifulSoup(nos.decode_contents(), "html.parser")
-                    for img in nsoup.find_all("img"):
-                        src = img.get("src")
-                        if src:
-                            imgs.append(src)
-                except Exception:
-                    pass
-    except Exception:
-        pass
-
-    # Deduplicate while preserving order
-    seen = set()
-    out: List[str] = []
-    for u in imgs:
-        if not u:
-            continue
-        # strip whitespace
-        u2 = u.strip()
-        if u2 and u2 not in seen:
-            seen.add(u2)
-            out.append(u2)
-    return out
+    return imgs
 
 
-def clean_html_summary(entry) -> Tuple[str, Optional[str]]:
-    """Return (text_summary, image_url) cleaned from the HTML content of the entry.
-    Prefer content[] if available, otherwise summary. Use BeautifulSoup to extract paragraphs and first image.
-    """
-    html = ""
-    if hasattr(entry, "content") and entry.content:
-        try:
-            html = entry.content[0].value
-        except Exception:
-            html = ""
-    if not html:
-        html = entry.get("summary", "") or entry.get("description", "") or ""
+def _noscript_images(soup) -> List[str]:
+    """Images inside the first <noscript> fallback of a parsed document."""
+    nos = soup.find("noscript")
+    if not nos:
+        return []
+    return [img.get("src") for img in nos.find_all("img") if img.get("src")]
 
-    soup = BeautifulSoup(html, "html.parser")
 
+def _clean_soup(soup) -> Tuple[str, Optional[str]]:
+    """Strip ads/scripts from a parsed document and return (text_summary, first_image_url)."""
     # remove ads and script/style tags
     for tag in soup.select(".ad, .advert, script, style, iframe"):
         tag.decompose()
@@ -294,13 +1089,9 @@ def clean_html_summary(entry) -> Tuple[str, Optional[str]]:
             # try noscript
             nos = soup.find("noscript")
             if nos:
-                try:
-                    nsoup = BeautifulSoup(nos.decode_contents(), "html.parser")
-                    nimg = nsoup.find("img")
-                    if nimg and nimg.get("src"):
-                        img_url = nimg.get("src")
-                except Exception:
-                    img_url = None
+                nimg = nos.find("img")
+                if nimg and nimg.get("src"):
+                    img_url = nimg.get("src")
         else:
             img_url = src
 
@@ -317,233 +1108,2561 @@ def clean_html_summary(entry) -> Tuple[str, Optional[str]]:
     return summary, img_url
 
 
+def extract_entry_html(entry, images: bool = True, clean: bool = True) -> Tuple[List[str], str, Optional[str]]:
+    """Return (image_urls, text_summary, summary_image_url) for an entry, parsing its HTML once.
+
+    `image_urls` is what extract_all_images() returns and (text_summary, summary_image_url) what
+    clean_html_summary() returns; the <noscript> fallbacks and the cleaned summary are read from
+    the same BeautifulSoup tree. Pass images=False or clean=False to skip either half.
+    """
+    body = _entry_html(entry)
+    clean_source = body or entry.get("summary", "") or entry.get("description", "") or ""
+    imgs: List[str] = []
+    soup = None
+    html = ""
+
+    if images:
+        scanned: List[str] = []
+        imgs = _metadata_images(entry, scanned)
+
+        # 3) HTML content: content[] then summary (unless already scanned above)
+        html = body
+        if not html and entry.get("summary"):
+            html = entry.get("summary", "")
+        if html and html not in scanned:
+            for m in IMG_RE.findall(html):
+                imgs.append(m)
+
+        # 4) noscript fallbacks; documents without a <noscript> tag need no parse for this
+        try:
+            if html and NOSCRIPT_RE.search(html):
+                from bs4 import BeautifulSoup
+
+                soup = BeautifulSoup(html, "html.parser")
+                imgs.extend(_noscript_images(soup))
+        except Exception:
+            soup = None
+
+    summary, summary_img = "", None
+    if clean:
+        if soup is None or html != clean_source:
+            from bs4 import BeautifulSoup
+
+            soup = BeautifulSoup(clean_source, "html.parser")
+        summary, summary_img = _clean_soup(soup)
+
+    # Deduplicate while preserving order
+    seen = set()
+    out: List[str] = []
+    for u in imgs:
+        if not u:
+            continue
+        # strip whitespace
+        u2 = u.strip()
+        if u2 and u2 not in seen:
+            seen.add(u2)
+            out.append(u2)
+    return out, summary, summary_img
+
+
+def extract_all_images(entry) -> List[str]:
+    """Return a list of image URLs found in the entry from several common locations.
+
+    Order is roughly: media_thumbnail, media_content, enclosures/links, images in HTML content/summary,
+    and images inside <noscript> fallbacks.
+    """
+    return extract_entry_html(entry, clean=False)[0]
+
+
+def clean_html_summary(entry) -> Tuple[str, Optional[str]]:
+    """Return (text_summary, image_url) cleaned from the HTML content of the entry.
+    Prefer content[] if available, otherwise summary. Use BeautifulSoup to extract paragraphs and first image.
+    """
+    _, summary, img_url = extract_entry_html(entry, images=False)
+    return summary, img_url
+
+
+# Feed-type handlers, keyed by the "type" of a feed config
+FEED_HANDLERS: Dict[str, type] = {}
+
+
+def register_handler(kind: str):
+    """Class decorator registering a FeedHandler subclass for feeds of type `kind`."""
+    def register(cls):
+        cls.kind = kind
+        FEED_HANDLERS[kind] = cls
+        return cls
+    return register
+
+
+class FeedHandler:
+    """Turns the entries of one feed into message content.
+
+    One instance is created per feed when the configuration is loaded (see compile_feeds()), so
+    per-feed settings are looked up once rather than for every entry.
+    """
+
+    kind = ""
+
+    def __init__(self, feed_cfg: Dict):
+        self.name = feed_cfg["name"]
+        self.url = feed_cfg["url"]
+        # Image URLs starting with this prefix are preferred over the entry's other images
+        self.preferred_image = feed_cfg.get("preferred_image")
+
+    def skip(self, entry, link: str) -> bool:
+        """Return True if the entry should be marked seen without being posted."""
+        return False
+
+    def render(self, entry) -> Tuple[str, Optional[str]]:
+        """Return (summary, image_url) for an entry; the image may be relative and is not validated."""
+        imgs = extract_entry_html(entry, clean=False)[0]
+        return entry.get("summary", ""), self.pick_image(imgs)
+
+    def needs_validation(self, image: str) -> bool:
+        """Return False for images that are known to be valid without probing them."""
+        return True
+
+    def aggregate_item(self, entry) -> Dict:
+        """Return the fields index.html shows for an entry (see FeedAggregate)."""
+        description = entry.get("summary", "") or ""
+        if len(description) > AGGREGATE_MAX_DESCRIPTION:
+            text = " ".join(unescape(re.sub(r"<[^>]*>", " ", description)).split())
+            description = escape(text[:AGGREGATE_MAX_DESCRIPTION].rstrip() + "\u2026")
+        return {"title": entry.get("title") or "No title", "link": entry.get("link") or "#", "description": description}
+
+    def websub(self, parsed) -> Optional[Tuple[str, str]]:
+        """Return the (hub, topic) to subscribe to for pushed updates, or None: by default the hub
+        and self link the feed advertises (see compact_feed())."""
+        hub, topic = parsed.get("hub"), parsed.get("topic")
+        return (hub, topic) if hub and topic else None
+
+    def pick_image(self, imgs: List[str]) -> Optional[str]:
+        if self.preferred_image:
+            for u in imgs:
+                if u.startswith(self.preferred_image):
+                    return u
+        return imgs[0] if imgs else None
+
+
+@register_handler("generic")
+class GenericHandler(FeedHandler):
+    """Posts the entry's summary as-is with the first image found."""
+
+
+@register_handler("html-article")
+class HtmlArticleHandler(FeedHandler):
+    """Article feeds with HTML bodies: posts a plain-text summary cleaned from the HTML."""
+
+    def render(self, entry) -> Tuple[str, Optional[str]]:
+        imgs, summary, summary_img = extract_entry_html(entry)
+        return summary, self.pick_image(imgs) or summary_img
+
+
+@register_handler("comic")
+class ComicHandler(FeedHandler):
+    """Comics: the image is the content, so no summary is posted."""
+
+    def render(self, entry) -> Tuple[str, Optional[str]]:
+        return "", self.pick_image(extract_entry_html(entry, clean=False)[0])
+
+
+YOUTUBE_CHANNEL_ID_RE = re.compile(r"[?&]channel_id=([\w-]+)")
+YOUTUBE_WEBSUB_HUB = "https://pubsubhubbub.appspot.com/"
+YOUTUBE_WEBSUB_TOPIC = "https://www.youtube.com/xml/feeds/videos.xml?channel_id="
+YOUTUBE_VIDEO_ID_RE = re.compile(r"(?:v=|/videos/|/embed/|/shorts/)([A-Za-z0-9_-]{6,})")
+
+
+@register_handler("youtube")
+class YouTubeHandler(FeedHandler):
+    """YouTube channel feeds: no description, the video's thumbnail as image, Shorts skipped."""
+
+    def skip(self, entry, link: str) -> bool:
+        if "/shorts/" in link:
+            LOG.info("Skipping YouTube Short: %s", link)
+            return True
+        return False
+
+    def render(self, entry) -> Tuple[str, Optional[str]]:
+        # Fast path: YouTube's Atom feed carries the video id, and its thumbnail URL is fixed
+        vid = entry.get("yt_videoid")
+        if vid:
+            return "", f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"
+
+        image = None
+        mt = entry.get("media_thumbnail")
+        if isinstance(mt, list) and mt:
+            mt = mt[0]
+        if isinstance(mt, dict):
+            image = mt.get("url") or mt.get("href")
+        if not image:
+            image = self.pick_image(extract_entry_html(entry, clean=False)[0])
+        if not image:
+            m = YOUTUBE_VIDEO_ID_RE.search(entry.get("link", ""))
+            if m:
+                image = f"https://i.ytimg.com/vi/{m.group(1)}/hqdefault.jpg"
+        return "", image
+
+    def needs_validation(self, image: str) -> bool:
+        return not any(p.match(image) for p in TRUSTED_IMAGE_PATTERNS)
+
+    def websub(self, parsed) -> Optional[Tuple[str, str]]:
+        # videos.xml does not advertise it, but YouTube pushes channel uploads through Google's hub
+        target = super().websub(parsed)
+        m = YOUTUBE_CHANNEL_ID_RE.search(self.url)
+        if target is None and m:
+            target = (YOUTUBE_WEBSUB_HUB, YOUTUBE_WEBSUB_TOPIC + m.group(1))
+        return target
+
+    def aggregate_item(self, entry) -> Dict:
+        # The fields of fetchYouTubeChannelFeed() in shared.js
+        link = entry.get("link") or "#"
+        vid = entry.get("yt_videoid") or ""
+        return {
+            "title": entry.get("title") or "No title",
+            "link": link,
+            "videoId": vid,
+            "isShort": "/shorts/" in link,
+            "thumbnail": self.render(entry)[1] or "",
+        }
+
+
+def resolve_handler(feed_cfg: Dict) -> FeedHandler:
+    """Create the handler for a feed config from its "type" (default "html-article" if the
+    config sets clean_html, else "generic")."""
+    kind = feed_cfg.get("type") or ("html-article" if feed_cfg.get("clean_html") else "generic")
+    try:
+        cls = FEED_HANDLERS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown type {kind!r} for feed {feed_cfg['name']}") from None
+    return cls(feed_cfg)
+
+
+def compile_feeds(feeds: List[Dict]) -> None:
+    """Attach each feed's handler to its config."""
+    for feed_cfg in feeds:
+        feed_cfg["handler"] = resolve_handler(feed_cfg)
+
+
+def feed_handler(feed_cfg: Dict) -> FeedHandler:
+    """Return the handler of a feed, resolving it for configs that did not go through compile_feeds()."""
+    handler = feed_cfg.get("handler")
+    if handler is None:
+        handler = feed_cfg["handler"] = resolve_handler(feed_cfg)
+    return handler
+
+
+compile_feeds(FEEDS)
+
+
+class Metrics:
+    """Thread-safe counters, gauges and latency histograms, rendered in the Prometheus text format.
+
+    A series is a metric name plus keyword labels, e.g.
+    METRICS.inc("rss_feed_fetches_total", feed="xkcd", status="304").
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        # per series: one count per bucket (not cumulative), then +Inf count, count and sum
+        self._histograms: Dict[Tuple, List[float]] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, object]) -> Tuple:
+        return (name,) + tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add(self, name: str, amount: float, **labels) -> None:
+        """Move a gauge up or down."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0.0] * (len(self.BUCKETS) + 3)
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(self.BUCKETS)] += 1
+            hist[-2] += 1
+            hist[-1] += value
+
+    @staticmethod
+    def _series(name: str, labels: Tuple, extra: str = "") -> str:
+        parts = ['%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels]
+        if extra:
+            parts.append(extra)
+        return f"{name}{{{','.join(parts)}}}" if parts else name
+
+    @staticmethod
+    def _value(value: float) -> str:
+        # Full precision: "%g" rounds large counters to 6 digits, which breaks rate()
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+
+    def render(self) -> str:
+        """Return every series in the Prometheus text exposition format."""
+        with self._lock:
+            counters, gauges = dict(self._counters), dict(self._gauges)
+            histograms = {key: list(hist) for key, hist in self._histograms.items()}
+        lines: List[str] = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            for key in sorted(series):
+                declare(key[0], kind)
+                lines.append(f"{self._series(key[0], key[1:])} {self._value(series[key])}")
+        for key in sorted(histograms):
+            name, labels, hist = key[0], key[1:], histograms[key]
+            declare(name, "histogram")
+            cumulative = 0.0
+            for bound, count in zip(self.BUCKETS + ("+Inf",), hist):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self._series(name + '_bucket', labels, le)} {self._value(cumulative)}")
+            lines.append(f"{self._series(name + '_count', labels)} {self._value(hist[-2])}")
+            lines.append(f"{self._series(name + '_sum', labels)} {self._value(hist[-1])}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, slowest: int = 5) -> Dict:
+        """Return the metrics summed over their "feed" label, plus the feeds slowest to fetch."""
+        with self._lock:
+            counters, gauges = dict(self._counters), dict(self._gauges)
+            histograms = {key: list(hist) for key, hist in self._histograms.items()}
+
+        def flatten(key: Tuple) -> str:
+            return self._series(key[0], tuple((k, v) for k, v in key[1:] if k != "feed"))
+
+        out: Dict[str, Dict] = {"counters": {}, "gauges": {}, "histograms": {}}
+        for section, series in (("counters", counters), ("gauges", gauges)):
+            for key, value in series.items():
+                name = flatten(key)
+                out[section][name] = out[section].get(name, 0) + value
+        per_feed: Dict[str, List[float]] = {}
+        for key, hist in histograms.items():
+            name = flatten(key)
+            total = out["histograms"].setdefault(name, {"count": 0, "sum": 0.0})
+            total["count"] += int(hist[-2])
+            total["sum"] = round(total["sum"] + hist[-1], 6)
+            labels = dict(key[1:])
+            if key[0] == "rss_feed_fetch_seconds" and "feed" in labels:
+                per_feed[labels["feed"]] = hist
+        out["slowest_feeds"] = {
+            feed: round(hist[-1] / hist[-2], 3)
+            for feed, hist in sorted(per_feed.items(), key=lambda kv: kv[1][-1] / max(1, kv[1][-2]), reverse=True)[:slowest]
+            if hist[-2]
+        }
+        return out
+
+
+METRICS = Metrics()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus) and /metrics.json on a background thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if path == "/metrics":
+                body, ctype = METRICS.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body, ctype = json.dumps(METRICS.summary()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            LOG.debug("metrics endpoint: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    LOG.info("Serving metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
+
+
+def start_metrics_log(interval: float) -> threading.Thread:
+    """Log a JSON summary of the metrics every `interval` seconds on a background thread."""
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            LOG.info("metrics %s", json.dumps(METRICS.summary(), sort_keys=True))
+
+    thread = threading.Thread(target=run, name="metrics-log", daemon=True)
+    thread.start()
+    return thread
+
+
+class StageTimer:
+    """Accumulates the calls, wall time and CPU time spent in each stage of a poll cycle.
+
+    Stages are fetch, parse, extract, validate and send. CPU time is per thread
+    (time.thread_time), so a stage running on several worker threads is charged only its own work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @contextmanager
+    def timed(self, stage: str):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            METRICS.observe("rss_stage_seconds", wall, stage=stage)
+            METRICS.inc("rss_stage_cpu_seconds_total", cpu, stage=stage)
+            with self._lock:
+                stats = self._stats.setdefault(stage, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+                stats["calls"] += 1
+                stats["wall"] += wall
+                stats["cpu"] += cpu
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return a snapshot of per-stage calls, wall and CPU seconds."""
+        with self._lock:
+            return {stage: dict(v) for stage, v in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+STAGES = StageTimer()
+timed = STAGES.timed
+
+
+class HttpClient:
+    """Shared HTTP transport: one pooled keep-alive session for feeds, image checks and webhooks.
+
+    Each host gets a connection pool of `pool_size` (or its entry in `pool_overrides`), idempotent
+    requests are retried on connection errors and 502/503/504 with exponential backoff, and the
+    number of requests vs newly opened connections is tracked per host so connection reuse can be
+    checked in the logs.
+    """
+
+    def __init__(self, pool_size: int = 10, pool_overrides: Optional[Dict[str, int]] = None, retries: int = 2, backoff: float = 0.5):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._config = (pool_size, pool_overrides or {}, retries, backoff)
+        self._session: Optional[requests.Session] = None
+        self._first_request = False
+
+    @property
+    def session(self) -> requests.Session:
+        """The session, set up (and requests imported) on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def _new_session(self) -> requests.Session:
+        from urllib3.util.retry import Retry
+
+        pool_size, pool_overrides, retries, backoff = self._config
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        session = requests.Session()
+        session.headers["User-Agent"] = "rss-to-discord/1.0 (+https://example.com)"
+        for scheme in ("http://", "https://"):
+            session.mount(scheme, self._adapter(pool_size, retry))
+        for host, size in pool_overrides.items():
+            for scheme in ("http://", "https://"):
+                session.mount(f"{scheme}{host}/", self._adapter(size, retry))
+        return session
+
+    def _adapter(self, size: int, retry: Retry) -> HTTPAdapter:
+        from requests.adapters import HTTPAdapter
+        from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+        client = self
+
+        class CountingAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    "http": client._counting_pool(HTTPConnectionPool),
+                    "https": client._counting_pool(HTTPSConnectionPool),
+                }
+
+        return CountingAdapter(pool_connections=size, pool_maxsize=size, max_retries=retry)
+
+    def _counting_pool(self, base):
+        client = self
+
+        class CountingPool(base):
+            def _new_conn(self):
+                client._count(self.host, "connections")
+                return super()._new_conn()
+
+        return CountingPool
+
+    def _count(self, host: str, key: str, amount: int = 1) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(host, {"requests": 0, "connections": 0, "bytes": 0})
+            stats[key] += amount
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", FEED_TIMEOUT)
+        host = (urlsplit(url).hostname or "").lower()
+        self._count(host, "requests")
+        if not self._first_request:
+            self._first_request = True
+            # Time from the start of the module to the first request, i.e. what a --once run pays
+            METRICS.set("rss_startup_seconds", time.monotonic() - STARTED)
+        resp = self.session.request(method, url, **kwargs)
+        if not kwargs.get("stream"):
+            self._count(host, "bytes", len(resp.content))
+        return resp
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def record_bytes(self, url: str, amount: int) -> None:
+        """Count bytes read from a streamed response."""
+        self._count((urlsplit(url).hostname or "").lower(), "bytes", amount)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return a snapshot of per-host request, new connection and byte counters."""
+        with self._lock:
+            return {host: dict(v) for host, v in self._stats.items()}
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        reqs = sum(s["requests"] for s in stats.values())
+        conns = sum(s["connections"] for s in stats.values())
+        if reqs:
+            LOG.info(
+                "HTTP: %d requests over %d new connections to %d hosts (%.0f%% reused), %d bytes received",
+                reqs, conns, len(stats), 100.0 * max(0, reqs - conns) / reqs, sum(s["bytes"] for s in stats.values()),
+            )
+
+
+HTTP = HttpClient(
+    pool_size=HTTP_POOL_SIZE,
+    pool_overrides=HTTP_POOL_OVERRIDES,
+    retries=HTTP_RETRIES,
+    backoff=HTTP_BACKOFF,
+)
+
+
+class ImageValidationCache:
+    """LRU cache of image validation results keyed by URL, with separate TTLs for hits and misses.
+
+    Hosts that fail at the connection level are remembered under a "host:" key for the negative
+    TTL so their other images are not probed again in the meantime. The cache is persisted in the
+    state store one entry per key (see save_image_cache()) and survives restarts; changes() tells
+    which keys were added, updated or dropped since the last save.
+    """
+
+    def __init__(self, max_entries: int = 5000, positive_ttl: float = 7 * 86400, negative_ttl: float = 3600):
+        self.max_entries = max_entries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (ok, expires_at)
+        self._changed: Set[str] = set()
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[bool]:
+        """Return the cached result for `key`, or None if unknown or expired."""
+        now = time.time() if now is None else now
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            if hit[1] <= now:
+                del self._entries[key]
+                self._changed.add(key)
+                return None
+            self._entries.move_to_end(key)
+            return hit[0]
+
+    def put(self, key: str, ok: bool, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._entries[key] = (ok, now + (self.positive_ttl if ok else self.negative_ttl))
+            self._entries.move_to_end(key)
+            self._changed.add(key)
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._changed.add(self._entries.popitem(last=False)[0])
+
+    def changes(self) -> Dict[str, Optional[List]]:
+        """Return and clear {key: [ok, expires_at], or None if dropped} since the last call."""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            return {key: list(self._entries[key]) if key in self._entries else None for key in changed}
+
+    def load(self, items: Dict[str, List], now: Optional[float] = None) -> None:
+        """Add stored {key: [ok, expires_at]} entries; expired ones are dropped (and reported by changes())."""
+        now = time.time() if now is None else now
+
+        def stored_at(item) -> float:
+            ok, expires = item[1]
+            return expires - (self.positive_ttl if ok else self.negative_ttl)
+
+        with self._lock:
+            for key, (ok, expires) in sorted(items.items(), key=stored_at):
+                if expires > now:
+                    self._entries[key] = (ok, expires)
+                else:
+                    self._changed.add(key)
+            self._evict()
+
+
+# Image URLs that are always served for a valid video; no need to probe them
+TRUSTED_IMAGE_PATTERNS = [
+    re.compile(r"^https://i\d?\.ytimg\.com/vi/[A-Za-z0-9_-]+/(?:hq|mq|sd|maxres)?default\.jpg$"),
+]
+
+IMAGE_CACHE_FEED = ":image_cache"  # pseudo-feed whose metadata keys are the cache's keys
+IMAGE_CACHE_LEGACY_META = ("", "image_cache")  # the whole cache as one value, as older versions stored it
+_IMAGE_CACHE: Optional[ImageValidationCache] = None
+
+
+def get_image_cache() -> ImageValidationCache:
+    global _IMAGE_CACHE
+    with STATE_LOCK:
+        if _IMAGE_CACHE is None:
+            cache = ImageValidationCache(IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL, IMAGE_CACHE_NEGATIVE_TTL)
+            try:
+                store = get_store()
+                legacy = store.get_feed_meta(*IMAGE_CACHE_LEGACY_META)
+                if legacy:
+                    store.set_feed_meta_many(IMAGE_CACHE_FEED, {key: [ok, expires] for key, ok, expires in legacy})
+                    store.set_feed_meta(*IMAGE_CACHE_LEGACY_META, None)
+                cache.load(store.feed_meta_items(IMAGE_CACHE_FEED))
+            except Exception:
+                LOG.exception("Failed to load image validation cache")
+            _IMAGE_CACHE = cache
+        return _IMAGE_CACHE
+
+
+def save_image_cache() -> None:
+    """Write the image validation cache entries that changed since the last save."""
+    with STATE_LOCK:
+        cache = _IMAGE_CACHE
+        if cache is None:
+            return
+        changes = cache.changes()
+        if changes:
+            get_store().set_feed_meta_many(IMAGE_CACHE_FEED, changes)
+
+
 def validate_image_url(image_url: str) -> Optional[str]:
-    """Return the image_url if it looks valid and reachable, otherwise None."""
+    """Return the image_url if it looks valid and reachable, otherwise None.
+
+    Results are cached (see ImageValidationCache) and URLs matching TRUSTED_IMAGE_PATTERNS are
+    accepted without a request.
+    """
     if not image_url:
         return None
     if not image_url.startswith("http"):
         return None
+    if any(p.match(image_url) for p in TRUSTED_IMAGE_PATTERNS):
+        METRICS.inc("rss_image_validations_total", result="trusted")
+        return image_url
+    cache = get_image_cache()
+    cached = cache.get(image_url)
+    if cached is not None:
+        LOG.debug("Image validation cache hit (%s): %s", cached, image_url)
+        METRICS.inc("rss_image_validations_total", result="cache_hit")
+        return image_url if cached else None
+    host_key = "host:" + urlsplit(image_url).netloc.lower()
+    if cache.get(host_key) is False:
+        LOG.debug("Skipping image on recently unreachable host: %s", image_url)
+        METRICS.inc("rss_image_validations_total", result="host_down")
+        return None
+    METRICS.inc("rss_image_validations_total", result="probed")
+
     try:
         # Prefer a lightweight HEAD; some servers don't respond properly so fall back to GET
-        resp = requests.head(image_url, timeout=6, allow_redirects=True)
+        resp = HTTP.head(image_url, timeout=IMAGE_TIMEOUT, allow_redirects=True)
         if resp.status_code >= 400 or not resp.headers.get("content-type"):
-            resp = requests.get(image_url, stream=True, timeout=6)
+            # Only the headers are needed; close right away so the connection returns to the pool
+            with HTTP.get(image_url, stream=True, timeout=IMAGE_TIMEOUT) as resp:
+                pass
         ct = resp.headers.get("content-type", "")
         if resp.status_code < 400 and ct.startswith("image"):
+            cache.put(image_url, True)
             return image_url
         LOG.debug("Image URL rejected by validation (status=%s, content-type=%s): %s", resp.status_code, ct, image_url)
+        cache.put(image_url, False)
         return None
-    except Exception:
-        LOG.debug("Exception validating image url %s", image_url, exc_info=True)
+    except Exception as e:
+        if _host_unreachable(e):
+            LOG.debug("Image host unreachable for %s", image_url, exc_info=True)
+            cache.put(host_key, False)
+        else:
+            LOG.debug("Exception validating image url %s", image_url, exc_info=True)
+            cache.put(image_url, False)
         return None
 
 
-def send_to_discord(title: str, link: str, webhook_url: str, summary: str = "", image_url: Optional[str] = None) -> bool:
-    headers = {"Content-Type": "application/json"}
-    # Truncate fields to Discord limits (conservative)
-    safe_title = (title or "").strip()[:256]
-    safe_description = (summary or "").strip()[:4000]
+def _host_unreachable(exc: Exception) -> bool:
+    """Whether a request failed to connect at all, as opposed to e.g. one slow response."""
+    from urllib3.exceptions import ReadTimeoutError
+
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.ConnectionError):
+        return False
+    # With retries, a read timeout surfaces as a ConnectionError wrapping MaxRetryError
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return not isinstance(reason, ReadTimeoutError)
 
+
+def build_embed(title: str, link: str, summary: str = "", image_url: Optional[str] = None) -> Dict:
+    # Truncate fields to Discord limits (conservative)
     embed: Dict = {
-        "title": safe_title,
+        "title": (title or "").strip()[:256],
         "url": link,
-        "description": safe_description,
+        "description": (summary or "").strip()[:4000],
     }
     if image_url:
         embed["image"] = {"url": image_url}
+    return embed
 
-    payload = {"embeds": [embed]}
 
-    try:
-        resp = requests.post(webhook_url, json=payload, headers=headers, timeout=15)
-        if resp.status_code in (200, 204):
-            LOG.info("Sent to Discord: %s", title)
+def _embed_size(embed: Dict) -> int:
+    """Characters counted towards Discord's 6000-per-message embed limit."""
+    return len(embed.get("title", "")) + len(embed.get("description", ""))
+
+
+class WebhookQueue:
+    """Ordered delivery queue for one Discord webhook.
+
+    Embeds are packed into messages of up to WEBHOOK_BATCH_SIZE embeds (Discord allows 10) while
+    staying under the 6000-character total. Posts honour the webhook's X-RateLimit-* bucket and
+    wait out 429 responses for their `retry_after` (globally if Discord says so); server errors
+    and connection failures are retried with exponential backoff and jitter. Each embed's callback
+    is called with True only once the message containing it was acknowledged.
+    """
+
+    MAX_EMBED_CHARS = 6000
+
+    def __init__(self, url: str):
+        self.url = url
+        # The webhook id, which unlike the URL's token is safe to show in metrics
+        parts = urlsplit(url).path.rstrip("/").split("/")
+        self.label = parts[-2] if len(parts) >= 2 and parts[-2].isdigit() else urlsplit(url).netloc
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[Dict, Callable[[bool], None]]] = []
+        self._remaining: Optional[int] = None
+        self._reset_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, embed: Dict, on_result: Callable[[bool], None]) -> None:
+        """Queue an embed, sending the current batch first if the embed would not fit in it."""
+        with self._lock:
+            size = sum(_embed_size(e) for e, _ in self._pending)
+            if self._pending and (
+                len(self._pending) >= max(1, WEBHOOK_BATCH_SIZE) or size + _embed_size(embed) > self.MAX_EMBED_CHARS
+            ):
+                self.flush()
+            self._pending.append((embed, on_result))
+
+    def flush(self) -> None:
+        """Send everything queued, in order."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            resp = None
+            try:
+                resp = self.post({"embeds": [embed for embed, _ in batch]})
+            except Exception:
+                LOG.exception("Failed to send webhook batch of %d", len(batch))
+            if resp is not None and resp.status_code in (200, 204):
+                for embed, on_result in batch:
+                    LOG.info("Sent to Discord: %s", embed.get("title"))
+                    on_result(True)
+                return
+            if resp is None or resp.status_code != 400:
+                if resp is not None:
+                    LOG.warning("Discord webhook returned %s for a batch of %d: %s", resp.status_code, len(batch), resp.text)
+                for _, on_result in batch:
+                    on_result(False)
+                return
+            LOG.warning("Discord webhook rejected a batch of %d: %s", len(batch), resp.text)
+            if len(batch) == 1:
+                embed, on_result = batch[0]
+                on_result(self._send_text_fallback(embed))
+                return
+            # One bad embed rejects the whole message: fall back to sending them one by one
+            for embed, on_result in batch:
+                on_result(self.send_one(embed))
+
+    def send_one(self, embed: Dict) -> bool:
+        """Send a single embed, falling back to a plain text message if Discord rejects it."""
+        title = embed.get("title", "")
+        try:
+            resp = self.post({"embeds": [embed]})
+            if resp.status_code in (200, 204):
+                LOG.info("Sent to Discord: %s", title)
+                return True
+            else:
+                LOG.warning("Discord webhook returned %s: %s", resp.status_code, resp.text)
+                # If embed was rejected (400), try a simpler fallback message
+                if resp.status_code == 400:
+                    return self._send_text_fallback(embed)
+                return False
+        except Exception:
+            LOG.exception("Failed to send webhook for %s", title)
+            return False
+
+    def _send_text_fallback(self, embed: Dict) -> bool:
+        title = embed.get("title", "")
+        try:
+            fallback = {"content": f"{title}\n{embed.get('url')}\n\n{embed.get('description', '')[:1900]}"}
+            resp2 = self.post(fallback)
+            if resp2.status_code in (200, 204):
+                LOG.info("Fallback text message sent for: %s", title)
+                return True
+            else:
+                LOG.warning("Fallback also failed %s: %s", resp2.status_code, resp2.text)
+                return False
+        except Exception:
+            LOG.exception("Fallback send failed for %s", title)
+            return False
+
+    def post(self, payload: Dict) -> requests.Response:
+        """POST a payload, waiting for rate limits and retrying 429/5xx/connection errors."""
+        headers = {"Content-Type": "application/json"}
+        with self._lock:
+            for attempt in range(max(1, WEBHOOK_MAX_ATTEMPTS)):
+                self._wait_for_bucket()
+                last_attempt = attempt == max(1, WEBHOOK_MAX_ATTEMPTS) - 1
+                try:
+                    with timed("send"):
+                        resp = HTTP.post(self.url, json=payload, headers=headers, timeout=WEBHOOK_TIMEOUT)
+                except (requests.ConnectionError, requests.Timeout):
+                    if last_attempt:
+                        raise
+                    self._backoff(attempt, "connection error")
+                    continue
+                self._update_bucket(resp)
+                METRICS.inc("rss_webhook_requests_total", webhook=self.label, status=resp.status_code)
+                if resp.status_code == 429 and not last_attempt:
+                    self._rate_limited(resp)
+                    continue
+                if resp.status_code >= 500 and not last_attempt:
+                    self._backoff(attempt, f"HTTP {resp.status_code}")
+                    continue
+                return resp
+        raise AssertionError("unreachable")
+
+    def _wait_for_bucket(self) -> None:
+        now = time.time()
+        wait = max(_GLOBAL_RATE_LIMIT_UNTIL, self._reset_at if self._remaining == 0 else 0.0) - now
+        if wait > 0:
+            LOG.info("Waiting %.1fs for Discord rate limit on webhook", wait)
+            METRICS.inc("rss_webhook_rate_limit_wait_seconds_total", wait, webhook=self.label)
+            time.sleep(wait)
+
+    def _update_bucket(self, resp: requests.Response) -> None:
+        try:
+            remaining = resp.headers.get("X-RateLimit-Remaining")
+            reset_after = resp.headers.get("X-RateLimit-Reset-After")
+            if remaining is not None:
+                self._remaining = int(remaining)
+                METRICS.set("rss_webhook_rate_limit_remaining", self._remaining, webhook=self.label)
+            if reset_after is not None:
+                self._reset_at = time.time() + float(reset_after)
+        except ValueError:
+            LOG.debug("Unparsable rate limit headers: %s", dict(resp.headers))
+
+    def _rate_limited(self, resp: requests.Response) -> None:
+        global _GLOBAL_RATE_LIMIT_UNTIL
+        retry_after = None
+        is_global = resp.headers.get("X-RateLimit-Global", "").lower() == "true"
+        try:
+            body = resp.json()
+            retry_after = float(body.get("retry_after"))
+            is_global = is_global or bool(body.get("global"))
+        except Exception:
+            pass
+        if retry_after is None:
+            try:
+                retry_after = float(resp.headers.get("Retry-After", "1"))
+            except ValueError:
+                retry_after = 1.0
+        # A little jitter so several webhooks don't all retry at the same instant
+        until = time.time() + retry_after + random.uniform(0, 0.25)
+        if is_global:
+            _GLOBAL_RATE_LIMIT_UNTIL = max(_GLOBAL_RATE_LIMIT_UNTIL, until)
+        else:
+            self._remaining, self._reset_at = 0, until
+        METRICS.inc("rss_webhook_rate_limited_total", webhook=self.label, scope="global" if is_global else "webhook")
+        LOG.warning("Discord rate limited the webhook (global=%s); retrying in %.1fs", is_global, retry_after)
+
+    def _backoff(self, attempt: int, reason: str) -> None:
+        delay = random.uniform(0, min(WEBHOOK_MAX_BACKOFF, WEBHOOK_BACKOFF * 2 ** attempt))
+        LOG.warning("Webhook post failed (%s); retrying in %.1fs", reason, delay)
+        time.sleep(delay)
+
+
+_GLOBAL_RATE_LIMIT_UNTIL = 0.0
+_WEBHOOK_QUEUES: Dict[str, WebhookQueue] = {}
+
+
+def webhook_queue(webhook_url: str) -> WebhookQueue:
+    """Return the queue of a webhook; its rate limit state is kept across poll cycles."""
+    with STATE_LOCK:
+        queue = _WEBHOOK_QUEUES.get(webhook_url)
+        if queue is None:
+            queue = _WEBHOOK_QUEUES[webhook_url] = WebhookQueue(webhook_url)
+        return queue
+
+
+def send_to_discord(title: str, link: str, webhook_url: str, summary: str = "", image_url: Optional[str] = None) -> bool:
+    return webhook_queue(webhook_url).send_one(build_embed(title, link, summary, image_url))
+
+
+class FeedScanError(Exception):
+    """The feed is not well-formed XML, so it cannot be scanned incrementally."""
+
+
+class _StopScan(Exception):
+    pass
+
+
+class FeedScanner:
+    """Incremental expat scan of a feed that stops at the first run of already-seen entries.
+
+    Bytes are fed in as they arrive. For every <item>/<entry> only its guid/id and link are
+    looked at; once `run` consecutive entries are known (per `is_known(id, link)`), reading stops.
+    result() then returns the document cut after the last new entry and re-closed, so feedparser
+    only has to parse the entries that matter while producing exactly what it would for them in
+    the full feed. Documents that are not ASCII-compatible are read whole, and well-formedness
+    errors raise FeedScanError.
+    """
+
+    ENTRY_TAGS = ("item", "entry")
+    KEY_TAGS = ("guid", "id", "link")
+
+    def __init__(self, is_known: Callable[[Optional[str], Optional[str]], bool], run: int = 3, max_bytes: int = 0):
+        self.is_known = is_known
+        self.run = max(1, run)
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.scanned_keys: List[str] = []
+        self.done = False
+        self._stack: List[str] = []
+        self._parser = xml.parsers.expat.ParserCreate()
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._chars
+        self._entry_depth: Optional[int] = None
+        self._entries_start: Optional[int] = None
+        self._keep_end: Optional[int] = None
+        self._keep_stack: List[str] = []
+        self._known_run = 0
+        self._field: Optional[str] = None
+        self._text: List[str] = []
+        self._id = ""
+        self._link = ""
+        self._checked = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consume a chunk; returns True once the rest of the document is not needed."""
+        if self.done:
             return True
+        self.data += chunk
+        if not self._checked and len(self.data) >= 4:
+            self._checked = True
+            # UTF-16/32 documents: closing tags could not simply be appended, so read everything
+            if self.data[:2] in (b"\xff\xfe", b"\xfe\xff") or b"\x00" in self.data[:4]:
+                self.is_known = lambda *keys: False
+        try:
+            self._parser.Parse(chunk, False)
+        except _StopScan:
+            self.done = True
+        except xml.parsers.expat.ExpatError as exc:
+            raise FeedScanError(str(exc)) from exc
+        if self.max_bytes and len(self.data) >= self.max_bytes and not self.done:
+            LOG.warning("Feed exceeds %d bytes; ignoring the rest", self.max_bytes)
+            self.done = True
+        return self.done
+
+    def result(self) -> Tuple[bytes, bool]:
+        """Return (document, truncated)."""
+        if not self.done:
+            return bytes(self.data), False
+        if self._keep_end is not None:
+            end, stack = self._keep_end, self._keep_stack
+        elif self._entries_start is not None:
+            end, stack = self._entries_start, self._keep_stack
         else:
-            LOG.warning("Discord webhook returned %s: %s", resp.status_code, resp.text)
-            # If embed was rejected (400), try a simpler fallback message
-            if resp.status_code == 400:
-                try:
-                    fallback = {"content": f"{safe_title}\n{link}\n\n{safe_description[:1900]}"}
-                    resp2 = requests.post(webhook_url, json=fallback, headers=headers, timeout=15)
-                    if resp2.status_code in (200, 204):
-                        LOG.info("Fallback text message sent for: %s", title)
-                        return True
-                    else:
-                        LOG.warning("Fallback also failed %s: %s", resp2.status_code, resp2.text)
-                        return False
-                except Exception:
-                    LOG.exception("Fallback send failed for %s", title)
-                    return False
-            return False
+            # Stopped (size cap) before the first entry ended: keep whatever parses
+            end, stack = len(self.data), self._stack
+        closing = "".join(f"</{name}>" for name in reversed(stack))
+        return bytes(self.data[:end]) + closing.encode("ascii"), True
+
+    def _start(self, name: str, attrs: Dict[str, str]) -> None:
+        local = name.rpartition(":")[2]
+        depth = len(self._stack)
+        self._stack.append(name)
+        if self._entry_depth is None:
+            if local in self.ENTRY_TAGS:
+                self._entry_depth = depth
+                self._id = self._link = ""
+                if self._entries_start is None:
+                    self._entries_start = self._parser.CurrentByteIndex
+                    self._keep_stack = self._stack[:-1]
+            return
+        if depth == self._entry_depth + 1 and local in self.KEY_TAGS:
+            if local == "link" and "href" in attrs:
+                if attrs.get("rel", "alternate") == "alternate" and not self._link:
+                    self._link = attrs["href"]
+                return
+            self._field = local
+            self._text = []
+
+    def _chars(self, data: str) -> None:
+        if self._field is not None:
+            self._text.append(data)
+
+    def _end(self, name: str) -> None:
+        self._stack.pop()
+        depth = len(self._stack)
+        if self._field is not None and self._entry_depth is not None and depth == self._entry_depth + 1:
+            text = "".join(self._text).strip()
+            if self._field == "link":
+                self._link = self._link or text
+            else:
+                self._id = self._id or text
+            self._field = None
+        if self._entry_depth is None or depth != self._entry_depth:
+            return
+        self._entry_depth = None
+        key = self._id or self._link
+        if key:
+            self.scanned_keys.append(key)
+        if self._id and self._link:
+            self.scanned_keys.append(self._link)  # a seen entry may still be keyed by its link
+        if key and self.is_known(self._id or None, self._link or None):
+            self._known_run += 1
+            if self._known_run >= self.run:
+                raise _StopScan()
+            return
+        self._known_run = 0
+        # CurrentByteIndex points at the start of the end tag (or of an empty element's tag)
+        tag_end = self.data.find(b">", self._parser.CurrentByteIndex)
+        self._keep_end = tag_end + 1 if tag_end >= 0 else len(self.data)
+        self._keep_stack = list(self._stack)
+
+
+def _read_capped(chunks, limit: int) -> bytes:
+    data = bytearray()
+    for chunk in chunks:
+        data += chunk
+        if limit and len(data) >= limit:
+            LOG.warning("Feed exceeds %d bytes; ignoring the rest", limit)
+            break
+    return bytes(data)
+
+
+def read_feed_body(resp: requests.Response, is_known: Optional[Callable[[Optional[str], Optional[str]], bool]] = None) -> Tuple[bytes, bool, List[str]]:
+    """Read a streamed feed response, stopping early at a run of known entries if `is_known` is given.
+
+    Returns (document, truncated, scanned_keys). Malformed feeds are read whole for feedparser.
+    """
+    chunks = resp.iter_content(STREAM_CHUNK_SIZE)
+    if is_known is None:
+        data = _read_capped(chunks, FEED_MAX_BYTES)
+        HTTP.record_bytes(resp.url, len(data))
+        return data, False, []
+    scanner = FeedScanner(is_known, STREAM_KNOWN_RUN, FEED_MAX_BYTES)
+    try:
+        for chunk in chunks:
+            if scanner.feed(chunk):
+                break
+    except FeedScanError as exc:
+        LOG.debug("Incremental scan of %s failed (%s); parsing the whole feed", resp.url, exc)
+        rest = _read_capped(chunks, max(1, FEED_MAX_BYTES - len(scanner.data)) if FEED_MAX_BYTES else 0)
+        HTTP.record_bytes(resp.url, len(scanner.data) + len(rest))
+        return bytes(scanner.data) + rest, False, []
+    HTTP.record_bytes(resp.url, len(scanner.data))
+    data, truncated = scanner.result()
+    if truncated:
+        # A short remainder is cheaper to download than a new connection: drain it so the
+        # connection goes back to the pool; otherwise closing the response drops it.
+        drained = 0
+        for chunk in chunks:
+            drained += len(chunk)
+            if drained > STREAM_DRAIN_BYTES:
+                break
+        HTTP.record_bytes(resp.url, drained)
+    return data, truncated, scanner.scanned_keys
+
+
+def parse_feed_body(content: bytes, feed_url: str, profile: Optional[Dict] = None):
+    """Parse a feed document with feedparser, retrying malformed ones with the detected encoding.
+
+    `profile` is what parsing the feed learned before: {"encoding": enc} if it only parses cleanly
+    once decoded with the detected encoding, which is then done right away, or {"bozo": exception
+    type} if it is malformed either way, which skips the retry. The profile is re-learned when
+    parsing with it stops working. The result carries the profile learned by this parse as
+    "parse_profile" and the number of feedparser passes it took as "parse_passes".
+    """
+    profile = profile or {}
+    passes = 0
+    if profile.get("encoding"):
+        try:
+            with timed("parse"):
+                feed = feedparser.parse(content.decode(profile["encoding"], errors="replace"))
+            passes += 1
+            if not getattr(feed, "bozo", False):
+                return _with_profile(feed, profile, passes)
+        except LookupError:
+            pass
+        LOG.info("Parse profile of %s no longer works; re-learning it", feed_url)
+
+    with timed("parse"):
+        feed = feedparser.parse(content)
+    passes += 1
+    if not getattr(feed, "bozo", False):
+        return _with_profile(feed, {}, passes)
+    bozo = type(getattr(feed, "bozo_exception", None)).__name__
+    if profile.get("bozo") == bozo:
+        LOG.debug("Feed %s is malformed as usual: %s", feed_url, getattr(feed, "bozo_exception", ""))
+        return _with_profile(feed, profile, passes)
+
+    LOG.warning("Feed parser reported bozo for %s (malformed feed): %s", feed_url, getattr(feed, "bozo_exception", ""))
+    learned = {"bozo": bozo}
+    # Try a recovery for common encoding mismatches using the detected encoding
+    try:
+        enc = requests.compat.chardet.detect(content)["encoding"] or "utf-8"
+        text = content.decode(enc, errors="replace")
+        with timed("parse"):
+            feed2 = feedparser.parse(text)
+        passes += 1
+        if not getattr(feed2, "bozo", False):
+            LOG.info("Recovered feed parse for %s using apparent_encoding=%s", feed_url, enc)
+            feed, learned = feed2, {"encoding": enc}
     except Exception:
-        LOG.exception("Failed to send webhook for %s", title)
-        return False
+        LOG.debug("Recovery parse failed for %s", feed_url, exc_info=True)
+    return _with_profile(feed, learned, passes)
+
+
+def _with_profile(feed, profile: Dict, passes: int):
+    feed["parse_profile"] = profile
+    feed["parse_passes"] = passes
+    return feed
 
 
-def fetch_entries(feed_url: str):
+def get_parse_profile(name: str) -> Dict:
+    """Return the parse profile learned for a feed, loading it from the state store on first use."""
+    with STATE_LOCK:
+        if name not in _PARSE_PROFILES:
+            try:
+                _PARSE_PROFILES[name] = get_store().get_feed_meta(name, "parse") or {}
+            except Exception:
+                LOG.debug("Failed to load parse profile of %s", name, exc_info=True)
+                return {}
+        return _PARSE_PROFILES[name]
+
+
+def record_parse(name: str, parsed) -> None:
+    """Count a fetch's feedparser passes and keep the parse profile it learned."""
+    passes = parsed.get("parse_passes")
+    if parsed.get("status") != 200 or passes is None:
+        return
+    METRICS.inc("rss_feed_parse_passes_total", passes, feed=name)
+    if passes > 1:
+        METRICS.inc("rss_feed_reparsed_total", feed=name)
+    profile = parsed.get("parse_profile") or {}
+    with STATE_LOCK:
+        if _PARSE_PROFILES.get(name, {}) == profile:
+            return
+        _PARSE_PROFILES[name] = profile
+        get_store().set_feed_meta(name, "parse", profile or None)
+    LOG.info("Parse profile of %s is now %s", name, profile or "plain")
+
+
+def fetch_entries(
+    feed_url: str,
+    etag: Optional[str] = None,
+    modified: Optional[str] = None,
+    is_known: Optional[Callable[[Optional[str], Optional[str]], bool]] = None,
+    parse: Optional[Callable[[bytes, str], object]] = None,
+):
     """Fetch the feed using requests and parse with feedparser.
+
+    `etag` / `modified` are the validators from the previous fetch; they are sent as
+    If-None-Match / If-Modified-Since. Like feedparser.parse(url, etag=..., modified=...), the
+    result carries `status`, `etag` and `modified`, and a 304 reply yields an empty result with
+    status 304 without parsing anything.
+
+    With `is_known(id, link)` (and STREAM_PARSE on) the body is scanned while it streams in and
+    reading stops at the first run of known entries; only the entries before it are parsed. Such
+    a result has `truncated` set and lists every scanned entry key in `scanned_keys`.
+
+    `parse(content, feed_url)` replaces parse_feed_body(), e.g. to parse in a worker process.
     """
     resp = None
+    truncated, scanned_keys = False, []
     try:
-        headers = {"User-Agent": "rss-to-discord/1.0 (+https://example.com)"}
-        resp = requests.get(feed_url, timeout=10, headers=headers)
-        if resp.status_code != 200:
-            LOG.warning("HTTP %s fetching %s", resp.status_code, feed_url)
-        content = resp.content
-        feed = feedparser.parse(content)
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+        with timed("fetch"):
+            resp = HTTP.get(feed_url, timeout=FEED_TIMEOUT, headers=headers, stream=True)
+        with resp:
+            if resp.status_code == 304:
+                LOG.info("Feed not modified: %s", feed_url)
+                return feedparser.FeedParserDict(
+                    status=304,
+                    bozo=False,
+                    feed=feedparser.FeedParserDict(),
+                    entries=[],
+                    etag=resp.headers.get("ETag") or etag,
+                    modified=resp.headers.get("Last-Modified") or modified,
+                )
+            if resp.status_code != 200:
+                LOG.warning("HTTP %s fetching %s", resp.status_code, feed_url)
+            scan = is_known if STREAM_PARSE and resp.status_code == 200 else None
+            with timed("fetch"):
+                content, truncated, scanned_keys = read_feed_body(resp, scan)
+        feed = (parse or parse_feed_body)(content, feed_url)
     except Exception:
         LOG.debug("requests fetch failed for %s, falling back to feedparser.fetch", feed_url, exc_info=True)
-        feed = feedparser.parse(feed_url)
+        return feedparser.parse(feed_url, etag=etag, modified=modified)
+
+    feed["status"] = resp.status_code
+    feed["bytes"] = len(content)
+    if truncated:
+        feed["truncated"] = True
+        feed["scanned_keys"] = scanned_keys
+        LOG.debug("Stopped reading %s early (%d entries parsed)", feed_url, len(feed.entries))
+    # Only remember validators of successful fetches
+    if resp.status_code == 200:
+        feed["etag"] = resp.headers.get("ETag")
+        feed["modified"] = resp.headers.get("Last-Modified")
+    return feed
+
+
+# Entry and feed fields kept in the records parse workers send back
+PARSED_ENTRY_FIELDS = ("id", "guid", "link", "title", "summary", "published_parsed", "updated_parsed", "yt_videoid", "media_thumbnail")
+PARSED_FEED_FIELDS = ("title", "ttl", "sy_updateperiod", "sy_updatefrequency", "links")
+
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
+_PARSE_POOL_LOCK = threading.Lock()
+_PARSE_POOL_FAILED = False
+
+
+def parse_worker(content: bytes, feed_url: str, feed_cfg: Dict, known: frozenset, profile: Optional[Dict] = None) -> Dict:
+    """Parse a feed in a worker process and return compact, picklable records.
+
+    Entries not in `known` (keys and links already seen) also carry the handler's rendering as
+    "rendered" = (summary, image), so HTML extraction happens in the worker too.
+    """
+    parsed = parse_feed_body(content, feed_url, profile)
+    handler = resolve_handler(feed_cfg)
+    entries = []
+    for entry in parsed.entries:
+        record = {field: entry[field] for field in PARSED_ENTRY_FIELDS if field in entry}
+        link = entry.get("link")
+        if link and entry_key(entry) not in known and link not in known:
+            record["rendered"] = handler.render(entry)
+        entries.append(record)
+    feed = parsed.get("feed") or {}
+    return {
+        "bozo": bool(parsed.get("bozo")),
+        "bozo_exception": str(parsed.get("bozo_exception", "")),
+        "parse_profile": parsed["parse_profile"],
+        "parse_passes": parsed["parse_passes"],
+        "feed": {field: feed[field] for field in PARSED_FEED_FIELDS if field in feed},
+        "entries": entries,
+    }
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the process pool for parsing, or None to parse in-process (PARSE_WORKERS=0 or broken)."""
+    global _PARSE_POOL
+    if PARSE_WORKERS <= 0 or _PARSE_POOL_FAILED:
+        return None
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            # Forking a process with running threads can copy held locks; start workers cleanly
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _PARSE_POOL = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _PARSE_POOL
+
+
+def _disable_parse_pool(reason: str) -> None:
+    global _PARSE_POOL, _PARSE_POOL_FAILED
+    with _PARSE_POOL_LOCK:
+        if not _PARSE_POOL_FAILED:
+            LOG.warning("Parse workers unavailable (%s); parsing in-process from now on", reason)
+        _PARSE_POOL_FAILED = True
+        pool, _PARSE_POOL = _PARSE_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def pooled_parser(feed_cfg: Dict, known: List[str], profile: Optional[Dict] = None) -> Callable[[bytes, str], object]:
+    """Return a parse function for fetch_entries() that parses on the process pool, or in-process
+    with parse_feed_body() if there is no pool or it fails."""
+    if get_parse_pool() is None:
+        return lambda content, feed_url: parse_feed_body(content, feed_url, profile)
+    spec = {k: v for k, v in feed_cfg.items() if k != "handler"}
+    known_keys = frozenset(known)
+
+    def parse(content: bytes, feed_url: str):
+        from concurrent.futures.process import BrokenProcessPool
+
+        pool = get_parse_pool()
+        if pool is None:
+            return parse_feed_body(content, feed_url, profile)
+        try:
+            with timed("parse"):
+                data = pool.submit(parse_worker, content, feed_url, spec, known_keys, profile).result()
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            _disable_parse_pool(f"{type(e).__name__}: {e}")
+            return parse_feed_body(content, feed_url, profile)
+        METRICS.inc("rss_parses_offloaded_total")
+        return feedparser.FeedParserDict(
+            bozo=data["bozo"],
+            bozo_exception=data["bozo_exception"],
+            parse_profile=data["parse_profile"],
+            parse_passes=data["parse_passes"],
+            feed=feedparser.FeedParserDict(data["feed"]),
+            entries=[feedparser.FeedParserDict(entry) for entry in data["entries"]],
+        )
+
+    return parse
+
+
+def _feed_host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+def host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Return the semaphore limiting concurrent requests to the host of `url`."""
+    host = _feed_host(url)
+    with _HOST_SEMAPHORES_LOCK:
+        sem = _HOST_SEMAPHORES.get(host)
+        if sem is None:
+            limit = HOST_CONCURRENCY_OVERRIDES.get(host, HOST_CONCURRENCY)
+            sem = threading.BoundedSemaphore(max(1, limit))
+            _HOST_SEMAPHORES[host] = sem
+        return sem
+
+
+def fetch_feed(feed_cfg: Dict, state: Dict):
+    """Fetch and parse one feed while holding its host's concurrency slot.
+
+    Feeds are read only up to their first run of already seen entries, except every
+    FULL_PARSE_EVERY-th fetch, which reads the whole feed so retention can be applied to it, and
+    the first fetch for an aggregate that does not have the feed's entries yet.
+    """
+    name = feed_cfg["name"]
+    url = feed_cfg["url"]
+    seen = state["feeds"]
+    aggregate = get_aggregate(feed_cfg)
+    with STATE_LOCK:
+        validators = dict(state.get("http", {}).get(name, {}))
+        known = seen.keys(name) if PARSE_WORKERS > 0 else []
+        polls = polls_since_full(name)
+        full = not seen.count(name) or polls + 1 >= max(1, FULL_PARSE_EVERY)
+        # An aggregate that does not list the feed yet needs all of its entries, not a 304
+        if aggregate is not None and not aggregate.has(name):
+            full, validators = True, {}
+
+    def is_known(entry_id: Optional[str], link: Optional[str]) -> bool:
+        with STATE_LOCK:
+            return seen.contains(name, entry_id, link)
+
+    with host_semaphore(url):
+        LOG.info("Checking feed %s -> %s", name, url)
+        started = time.perf_counter()
+        try:
+            parsed = fetch_entries(
+                url,
+                etag=validators.get("etag"),
+                modified=validators.get("modified"),
+                is_known=None if full else is_known,
+                parse=pooled_parser(feed_cfg, known, get_parse_profile(name)),
+            )
+        except Exception:
+            METRICS.inc("rss_feed_fetches_total", feed=name, status="error")
+            raise
+    METRICS.observe("rss_feed_fetch_seconds", time.perf_counter() - started, feed=name)
+    METRICS.inc("rss_feed_fetches_total", feed=name, status=parsed.get("status", "error"))
+    METRICS.inc("rss_feed_bytes_total", parsed.get("bytes", 0), feed=name)
+    if parsed.get("truncated"):
+        METRICS.inc("rss_feed_truncated_total", feed=name)
+    record_parse(name, parsed)
+    if parsed.get("status") == 200 and not parsed.get("truncated"):
+        set_polls_since_full(name, 0)
+    elif parsed.get("status") != 304:
+        set_polls_since_full(name, polls + 1)
+    return parsed
+
+
+def polls_since_full(name: str) -> int:
+    """Return how many fetches of a feed were not read whole, loading it from the state store on
+    first use so the count carries over between --once runs."""
+    with STATE_LOCK:
+        if name not in _POLLS_SINCE_FULL:
+            try:
+                _POLLS_SINCE_FULL[name] = get_store().get_feed_meta(name, "polls_since_full") or 0
+            except Exception:
+                LOG.debug("Failed to load the full-read count of %s", name, exc_info=True)
+                return 0
+        return _POLLS_SINCE_FULL[name]
+
+
+def set_polls_since_full(name: str, polls: int) -> None:
+    with STATE_LOCK:
+        if _POLLS_SINCE_FULL.get(name) == polls:
+            return
+        _POLLS_SINCE_FULL[name] = polls
+        get_store().set_feed_meta(name, "polls_since_full", polls or None)
+
+
+def update_validators(state: Dict, name: str, parsed, complete: bool) -> None:
+    """Store the ETag/Last-Modified of a processed fetch next to the seen-link state.
+
+    Validators are only kept when every entry of the fetch was handled; otherwise they are dropped
+    so the next poll downloads the full feed again instead of getting a 304 and never retrying.
+    """
+    if parsed.get("status") == 304 or parsed.get("pushed"):
+        return
+    validators = {}
+    if complete:
+        validators = {k: parsed.get(k) for k in ("etag", "modified") if parsed.get(k)}
+    with STATE_LOCK:
+        http_state = state.setdefault("http", {})
+        if http_state.get(name, {}) == validators:
+            return
+        if validators:
+            http_state[name] = validators
+        else:
+            http_state.pop(name, None)
+        get_store().set_feed_meta(name, "http", validators or None)
+
 
-    if getattr(feed, "bozo", False):
-        LOG.warning("Feed parser reported bozo for %s (malformed feed): %s", feed_url, getattr(feed, "bozo_exception", ""))
-        # Try a recovery for common encoding mismatches using apparent_encoding
+class ImageValidationStage:
+    """Validates the images of a poll cycle concurrently, ahead of delivery.
+
+    Images are submitted as soon as their feed is prepared and checked on a shared pool of
+    `workers` threads. Delivery reads the result with result(), waiting at most `deadline`
+    seconds from submission, so a slow image host costs its deadline once rather than stalling
+    every entry behind it in turn.
+    """
+
+    def __init__(self, workers: int, deadline: float):
+        self.deadline = deadline
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="image")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Tuple[Future, float]] = {}
+
+    def submit(self, image_url: str) -> None:
+        with self._lock:
+            if image_url not in self._jobs:
+                self._jobs[image_url] = (self._pool.submit(self._validate, image_url), time.monotonic())
+
+    @staticmethod
+    def _validate(image_url: str) -> Optional[str]:
+        with timed("validate"):
+            return validate_image_url(image_url)
+
+    def result(self, image_url: str) -> Optional[str]:
+        """Return the validated URL, or None if validation failed or missed the deadline."""
+        self.submit(image_url)
+        with self._lock:
+            future, submitted = self._jobs[image_url]
         try:
-            if resp is not None:
-                enc = resp.apparent_encoding or "utf-8"
-                text = resp.content.decode(enc, errors="replace")
-                feed2 = feedparser.parse(text)
-                if not getattr(feed2, "bozo", False):
-                    LOG.info("Recovered feed parse for %s using apparent_encoding=%s", feed_url, enc)
-                    return feed2
+            return future.result(timeout=max(0.0, submitted + self.deadline - time.monotonic()))
+        except FutureTimeout:
+            LOG.info("Image validation missed the %.0fs deadline: %s", self.deadline, image_url)
+            return None
+
+    def close(self) -> None:
+        # Stragglers keep running in the background and only fill the validation cache
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def prepare_entries(feed_cfg: Dict, parsed, state: Dict, budget: Optional[MemoryBudget] = None) -> List[Dict]:
+    """Turn the unseen entries of a fetched feed into messages ready for delivery.
+
+    Returns dicts with key, link, title, summary, image and whether the image still needs to be
+    validated, oldest first. The feed's handler decides what goes into each message. Once
+    `budget` is used up, the remaining new entries are left for a later poll and
+    parsed["deferred"] says how many there were.
+    """
+    name = feed_cfg["name"]
+    handler = feed_handler(feed_cfg)
+    url = feed_cfg["url"]
+    entries = parsed.entries
+    items: List[Dict] = []
+    pending = set()
+    deferred = 0
+
+    seen = state["feeds"]
+    keys = [entry_key(entry) for entry in entries]
+    with STATE_LOCK:
+        # Entries stored under their link by older versions move to their id, or they would never
+        # be observed again and age out while still in the feed
+        moved = [
+            (entry.get("link"), key)
+            for entry, key in zip(entries, keys)
+            if key and entry.get("link") and key != entry.get("link") and seen.rekey(name, entry.get("link"), key)
+        ]
+        for link, key in moved:
+            get_store().add_seen(name, key)
+        if moved:
+            get_store().forget_seen(name, [link for link, key in moved])
+            LOG.debug("Moved %d seen entries of %s from their link to their id", len(moved), name)
+        seen.observe(name, [key for key in keys if key] + parsed.get("scanned_keys", []))
+
+    # Process oldest first so Discord receives items in chronological order
+    for entry, key in zip(reversed(entries), reversed(keys)):
+        link = entry.get("link")
+        if not link:
+            continue
+        with STATE_LOCK:
+            if key in pending or seen.contains(name, key, link):
+                continue
+        pending.add(key)
+        if deferred:
+            deferred += 1
+            continue
+
+        if handler.skip(entry, link):
+            # mark as seen so we don't retry repeatedly
+            mark_seen(state, name, key)
+            continue
+
+        title = entry.get("title", name)
+        if "rendered" in entry:
+            # Already extracted by a parse worker
+            summary, image = entry["rendered"]
+        else:
+            with timed("extract"):
+                summary, image = handler.render(entry)
+        # Resolve relative image URLs against feed URL
+        if image and not image.startswith("http"):
+            try:
+                image = urljoin(url, image)
+            except Exception:
+                LOG.debug("Failed to resolve image URL %s for feed %s", image, name)
+        validate = bool(image) and handler.needs_validation(image)
+        item = {"key": key, "link": link, "title": title, "summary": summary, "image": image, "validate": validate}
+        if budget is not None and not budget.charge(sum(map(sys.getsizeof, item.values())) + sys.getsizeof(item)):
+            deferred = 1
+            continue
+        items.append(item)
+
+    METRICS.inc("rss_entries_parsed_total", len(entries), feed=name)
+    METRICS.inc("rss_entries_new_total", len(items), feed=name)
+    if deferred:
+        parsed["deferred"] = deferred
+        METRICS.inc("rss_entries_deferred_total", deferred, feed=name)
+        LOG.warning("Cycle memory budget used up; %d new entries of %s wait for the next poll", deferred, name)
+    return items
+
+
+class MemoryBudget:
+    """Bytes the messages prepared in one poll cycle may take (0 = no limit)."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def charge(self, amount: int) -> bool:
+        """Reserve `amount` bytes; False if that would exceed the limit."""
+        with self._lock:
+            if self.limit and self.used + amount > self.limit:
+                return False
+            self.used += amount
+            return True
+
+
+def cap_entries(feed_cfg: Dict, parsed) -> None:
+    """Keep only the newest entries of a feed: its "max_entries", else FEED_MAX_ENTRIES (0 = all)."""
+    cap = feed_cfg.get("max_entries", FEED_MAX_ENTRIES)
+    entries = parsed.get("entries") or []
+    if cap <= 0 or len(entries) <= cap:
+        return
+    # Newest by date, in document order among equal or missing dates
+    newest = sorted(range(len(entries)), key=lambda i: (-(entry_timestamp(entries[i]) or 0), i))[:cap]
+    parsed["entries"] = [entries[i] for i in sorted(newest)]
+    METRICS.inc("rss_entries_capped_total", len(entries) - cap, feed=feed_cfg["name"])
+
+
+COMPACT_FEED_FIELDS = (
+    "status", "bozo", "etag", "modified", "bytes", "truncated", "scanned_keys", "deferred", "parse_profile", "parse_passes", "pushed",
+)
+
+
+def compact_feed(feed_cfg: Dict, parsed):
+    """Return the parts of a prepared feed that delivery, the scheduler and the aggregates use,
+    with its entries as EntryRecords, so feedparser's tree can be freed."""
+    aggregate = get_aggregate(feed_cfg) is not None and parsed.get("status") == 200
+    handler = feed_handler(feed_cfg) if aggregate else None
+    compact = feedparser.FeedParserDict()
+    for field in COMPACT_FEED_FIELDS:
+        if field in parsed:
+            compact[field] = parsed[field]
+    feed = parsed.get("feed") or {}
+    compact["feed"] = feedparser.FeedParserDict({field: feed[field] for field in PARSED_FEED_FIELDS if field in feed and field != "links"})
+    # WebSub discovery: <link rel="hub"> and <link rel="self"> (atom:link in RSS)
+    for link in feed.get("links") or []:
+        if link.get("rel") == "hub" and "hub" not in compact:
+            compact["hub"] = link.get("href")
+        elif link.get("rel") == "self" and "topic" not in compact:
+            compact["topic"] = link.get("href")
+    compact["entries"] = [EntryRecord.from_entry(entry, handler) for entry in parsed.get("entries") or []]
+    return compact
+
+
+def deliver_entries(feed_cfg: Dict, items: List[Dict], queue: WebhookQueue, state: Dict, images: ImageValidationStage) -> Dict[str, int]:
+    """Queue prepared entries on the webhook's queue in order.
+
+    Each entry is marked seen once the message carrying it was acknowledged. Returns a counter
+    dict whose "failed" value is filled in as the queue reports results; it is final after the
+    queue has been flushed.
+    """
+    name = feed_cfg["name"]
+    outcome = {"queued": 0, "failed": 0}
+
+    def on_result(item: Dict) -> Callable[[bool], None]:
+        def done(sent: bool) -> None:
+            METRICS.add("rss_queued_entries", -1, feed=name)
+            if sent:
+                METRICS.inc("rss_entries_sent_total", feed=name)
+                mark_seen(state, name, item["key"])
+            else:
+                METRICS.inc("rss_entries_failed_total", feed=name)
+                LOG.warning("Will retry this entry later: %s", item["link"])
+                outcome["failed"] += 1
+        return done
+
+    for item in items:
+        image = item["image"]
+        # Validate image URL to avoid Discord embed validation errors
+        if item["validate"]:
+            valid_image = images.result(image)
+            if not valid_image:
+                LOG.info("Dropping image for %s because validation failed: %s", name, image)
+                image = None
+            else:
+                image = valid_image
+
+        METRICS.add("rss_queued_entries", 1, feed=name)
+        queue.put(build_embed(item["title"], item["link"], item["summary"], image), on_result(item))
+        outcome["queued"] += 1
+
+    return outcome
+
+
+def fetch_and_prepare(feed_cfg: Dict, state: Dict, images: ImageValidationStage, budget: Optional[MemoryBudget] = None):
+    """Fetch a feed (or take what its WebSub hub pushed), prepare its new entries and queue their
+    images for validation.
+
+    Returns the compacted feed (see compact_feed()) and the prepared messages.
+    """
+    parsed = _WEBSUB.take(feed_cfg) if _WEBSUB is not None else None
+    if parsed is None:
+        parsed = fetch_feed(feed_cfg, state)
+    cap_entries(feed_cfg, parsed)
+    items = prepare_entries(feed_cfg, parsed, state, budget) if webhook_for_feed(feed_cfg) else []
+    for item in items:
+        if item["validate"]:
+            images.submit(item["image"])
+    return compact_feed(feed_cfg, parsed), items
+
+
+def _deliver_webhook_feeds(webhook: Optional[str], feed_cfgs: List[Dict], fetches: Dict[str, Future], state: Dict, images: ImageValidationStage) -> None:
+    """Deliver the feeds sharing one webhook strictly in config order, batching across feeds.
+
+    With webhook None (aggregate-only feeds) nothing is sent; only the feeds' validators are kept.
+    """
+    queue = webhook_queue(webhook) if webhook else None
+    delivered = []
+    for feed_cfg in feed_cfgs:
+        name = feed_cfg["name"]
+        try:
+            parsed, items = fetches[name].result()
+        except Exception:
+            LOG.exception("Fetching feed %s failed", name)
+            continue
+        if _SHARD is not None and not _SHARD.owns(name):
+            # Fencing: the lease moved on during the poll; its new owner delivers these entries
+            LOG.warning("Lost the lease on %s while polling it; not delivering", name)
+            continue
+        try:
+            delivered.append((feed_cfg, parsed, deliver_entries(feed_cfg, items, queue, state, images)))
+        except Exception:
+            LOG.exception("Unexpected error processing feed %s", name)
+    try:
+        if queue is not None:
+            queue.flush()
+    except Exception:
+        LOG.exception("Unexpected error flushing webhook queue")
+
+    for feed_cfg, parsed, outcome in delivered:
+        name = feed_cfg["name"]
+        try:
+            # Deferred entries need the next poll to fetch the feed again rather than get a 304
+            update_validators(state, name, parsed, outcome["failed"] == 0 and not parsed.get("deferred"))
+            # A truncated fetch does not show how many entries the feed still carries
+            if parsed.get("status") == 200 and not parsed.get("truncated"):
+                prune_seen(state, name, keep=len(parsed.entries))
         except Exception:
-            LOG.debug("Recovery parse failed for %s", feed_url, exc_info=True)
+            LOG.exception("Unexpected error processing feed %s", name)
 
-    return feed
 
+class FeedAggregate:
+    """The newest entries of a group of feeds, written to one JSON file for the static pages.
 
-def main():
-    LOG.info("Starting multi-feed -> Discord forwarder. Poll interval=%s seconds", POLL_INTERVAL)
-    state = load_state()
+    Each cycle's parsed entries are merged into what earlier cycles collected, so feeds that were
+    only read up to their known entries, answered 304 or failed keep their items; a complete
+    parse replaces the feed's items. Items are ordered newest first, with ties broken by feed and
+    link so unchanged input gives byte-identical output, and capped per feed and per file. The
+    file is only rewritten when its content changes, together with .gz and .br (if brotli is
+    installed) copies for web servers that serve precompressed files.
 
-    while True:
+    A shared aggregate is written by several sharded workers: each write locks the file, re-reads
+    it and keeps the items of the feeds other workers own, so only this worker's feeds change.
+    """
+
+    def __init__(self, path: str, max_items: int = AGGREGATE_MAX_ITEMS, max_per_feed: int = AGGREGATE_MAX_PER_FEED, shared: bool = False):
+        self.path = path
+        self.max_items = max_items
+        self.max_per_feed = max_per_feed
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._feeds: Dict[str, Dict[str, Dict]] = {}  # feed name -> {entry key: item}
+        self._own: set = set()  # feeds updated by this process since it (re)gained them
+        self._names: Optional[set] = None  # the configured feeds, once retain() was called
+        self._written: Optional[bytes] = None
+        self._load()
+
+    def _load(self) -> None:
         try:
-            for feed_cfg in FEEDS:
-                name = feed_cfg["name"]
-                url = feed_cfg["url"]
-                webhook = webhook_for_feed(feed_cfg)
+            with open(self.path, "rb") as f:
+                data = f.read()
+            feeds: Dict[str, Dict[str, Dict]] = {}
+            for item in json.loads(data)["items"]:
+                feeds.setdefault(item["feed"], {})[item["key"]] = item
+        except FileNotFoundError:
+            return
+        except (ValueError, KeyError, TypeError):
+            LOG.warning("Ignoring unreadable aggregate %s", self.path)
+            return
+        # Feeds this process updated keep its own items; the others are taken from the file
+        for name in set(self._feeds) - self._own - set(feeds):
+            del self._feeds[name]
+        for name, items in feeds.items():
+            if name not in self._own and (self._names is None or name in self._names):
+                self._feeds[name] = items
+        self._written = data
+
+    @contextmanager
+    def _file_lock(self):
+        if not self.shared or fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def update(self, feed_cfg: Dict, parsed) -> None:
+        """Merge the entries of a fetch (compacted by compact_feed()) into the feed's items."""
+        if parsed is None or parsed.get("status") != 200:
+            return
+        name = feed_cfg["name"]
+        source = parsed.get("feed", {}).get("title") or name
+        items: Dict[str, Dict] = {}
+        for record in parsed.entries:
+            key = record.key
+            if not key or record.aggregate is None:
+                continue
+            ts = record.published or 0
+            item = dict(record.aggregate)
+            item.update(
+                feed=name,
+                key=key,
+                ts=ts,
+                pubDate=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts)) if ts else "",
+                source=source,
+            )
+            items[key] = item
+        with self._lock:
+            if parsed.get("truncated"):
+                items = dict(self._feeds.get(name, {}), **items)
+            newest = sorted(items.values(), key=self._order)[: self.max_per_feed]
+            self._feeds[name] = {item["key"]: item for item in newest}
+            self._own.add(name)
+
+    def has(self, name: str) -> bool:
+        with self._lock:
+            return name in self._feeds
+
+    def retain(self, names) -> None:
+        """Drop the items of feeds that are no longer configured."""
+        with self._lock:
+            self._names = set(names)
+            for name in set(self._feeds) - self._names:
+                del self._feeds[name]
+
+    def disown(self, name: str) -> None:
+        """Leave a feed's items to the worker that took it over."""
+        with self._lock:
+            self._own.discard(name)
+
+    @staticmethod
+    def _order(item: Dict) -> Tuple:
+        return (-item["ts"], item["feed"], item["link"], item["key"])
+
+    def write(self) -> bool:
+        """Write the file (and its compressed copies) if its content changed; return whether it did."""
+        with self._lock, self._file_lock():
+            if self.shared:
+                self._load()
+            items = sorted((item for feed in self._feeds.values() for item in feed.values()), key=self._order)
+            data = json.dumps({"items": items[: self.max_items]}, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            if data == self._written:
+                return False
+            variants = [("", data), (".gz", gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                variants.append((".br", brotli.compress(data)))
+            # Compressed copies first, so a server never pairs a new .json with a stale .gz
+            for suffix, content in reversed(variants):
+                tmp = f"{self.path}{suffix}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(content)
+                os.replace(tmp, self.path + suffix)
+            self._written = data
+        LOG.info("Wrote %s (%d items, %d bytes)", self.path, min(len(items), self.max_items), len(data))
+        return True
+
+
+_AGGREGATES: Dict[str, FeedAggregate] = {}
+_SHARD: Optional[ShardCoordinator] = None  # set by main() when SHARDING is on
+
+
+def get_aggregate(feed_cfg: Dict) -> Optional[FeedAggregate]:
+    """Return the aggregate a feed is written to, loading it on first use; None if it has none."""
+    group = feed_cfg.get("aggregate")
+    if not group or not AGGREGATE_DIR:
+        return None
+    with STATE_LOCK:
+        aggregate = _AGGREGATES.get(group)
+        if aggregate is None:
+            aggregate = _AGGREGATES[group] = FeedAggregate(os.path.join(AGGREGATE_DIR, f"{group}.json"), shared=SHARDING)
+            aggregate.retain(f["name"] for f in FEEDS if f.get("aggregate") == group)
+        return aggregate
+
+
+def update_aggregates(feeds: List[Dict], results: Dict[str, object]) -> None:
+    """Merge a cycle's results into the aggregate files of their feeds and write the changed ones."""
+    touched = {}
+    for feed_cfg in feeds:
+        aggregate = get_aggregate(feed_cfg)
+        if aggregate is None or feed_cfg["name"] not in results:
+            continue
+        aggregate.update(feed_cfg, results[feed_cfg["name"]])
+        touched[feed_cfg["aggregate"]] = aggregate
+    for group, aggregate in sorted(touched.items()):
+        try:
+            aggregate.write()
+        except OSError:
+            LOG.exception("Could not write aggregate %s", group)
 
-                if not webhook:
-                    LOG.info("No webhook configured for feed '%s' (env %s); skipping", name, feed_cfg.get("webhook_env"))
-                    continue
 
-                LOG.info("Checking feed %s -> %s", name, url)
-                parsed = fetch_entries(url)
-                entries = parsed.entries
+def poll_cycle(state: Dict, feeds: Optional[List[Dict]] = None) -> Dict[str, object]:
+    """Poll every feed once and return {feed name: parsed result, or None if fetching raised}.
+
+    All feeds are fetched and parsed concurrently on a bounded worker pool (with per-host limits),
+    and the images of their new entries are validated concurrently on a separate pool. Each
+    webhook gets its own delivery thread that walks its feeds in config order, so the order of
+    messages per webhook is the same as with a sequential loop.
+    """
+    started = time.monotonic()
+    feeds = FEEDS if feeds is None else feeds
+    # Aggregate-only feeds are grouped under the webhook None: fetched, but nothing is posted
+    by_webhook: Dict[Optional[str], List[Dict]] = {}
+    for feed_cfg in feeds:
+        webhook = webhook_for_feed(feed_cfg)
+        if not webhook and not feed_cfg.get("aggregate"):
+            LOG.info("No webhook configured for feed '%s' (env %s); skipping", feed_cfg["name"], feed_cfg.get("webhook_env"))
+            continue
+        by_webhook.setdefault(webhook, []).append(feed_cfg)
+    if not by_webhook:
+        return {}
+
+    # Feeds dropped from the config are no longer observed, so their keys age out
+    configured = {feed_cfg["name"] for feed_cfg in FEEDS} | {feed_cfg["name"] for feed_cfgs in by_webhook.values() for feed_cfg in feed_cfgs}
+    for name in state["feeds"].feeds():
+        if name not in configured:
+            prune_seen(state, name)
+
+    images = ImageValidationStage(IMAGE_VALIDATION_WORKERS, IMAGE_VALIDATION_DEADLINE)
+    budget = MemoryBudget(CYCLE_MEMORY_BUDGET)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS), thread_name_prefix="fetch") as fetch_pool:
+            fetches = {
+                feed_cfg["name"]: fetch_pool.submit(fetch_and_prepare, feed_cfg, state, images, budget)
+                for feed_cfgs in by_webhook.values()
+                for feed_cfg in feed_cfgs
+            }
+            with ThreadPoolExecutor(max_workers=len(by_webhook), thread_name_prefix="deliver") as delivery_pool:
+                jobs = [
+                    delivery_pool.submit(_deliver_webhook_feeds, webhook, feed_cfgs, fetches, state, images)
+                    for webhook, feed_cfgs in by_webhook.items()
+                ]
+                for job in jobs:
+                    job.result()
+    finally:
+        images.close()
+
+    save_image_cache()
+    METRICS.observe("rss_cycle_seconds", time.monotonic() - started)
+    METRICS.set("rss_cycle_prepared_bytes", budget.used)
+    LOG.info("Poll cycle over %d feeds finished in %.1fs", len(fetches), time.monotonic() - started)
+    HTTP.log_stats()
+
+    results: Dict[str, object] = {}
+    for name, future in fetches.items():
+        try:
+            results[name] = future.result()[0]
+        except Exception:
+            results[name] = None
+    update_aggregates(feeds, results)
+    return results
 
-                seen_links = set(state.get("feeds", {}).get(name, []))
 
-                # Process oldest first so Discord receives items in chronological order
-                for entry in reversed(entries):
-                    link = entry.get("link")
-                    if not link:
-                        continue
-                    if link in seen_links:
-                        continue
+class WebSub:
+    """WebSub (PubSubHubbub) push ingestion.
 
-                    # If this is a YouTube feed and the link is a Shorts URL, skip it
-                    if name.startswith("youtube:") and "/shorts/" in (link or ""):
-                        LOG.info("Skipping YouTube Short: %s", link)
-                        # mark as seen so we don't retry repeatedly
-                        seen_links.add(link)
-                        state.setdefault("feeds", {})[name] = list(seen_links)
-                        save_state(state)
-                        continue
+    After a feed is polled it is subscribed at the hub it advertises (YouTube channels at YouTube's
+    hub, see FeedHandler.websub()), with a callback URL of its own and a random secret, and the
+    subscription is renewed a day before its lease runs out. Subscriptions are kept in the state
+    store. The callback server answers the hubs' verification requests and accepts content whose
+    X-Hub-Signature HMAC matches the feed's secret; the documents wait in an inbox until the main
+    loop takes them through the usual prepare, dedup and delivery path (see take()).
+    """
 
-                    title = entry.get("title", name)
-                    # Default summary and image
-                    summary = ""
-                    image = None
-
-                    # Special handling for YouTube feeds: omit summary, use the channel/video thumbnail
-                    if name.startswith("youtube:"):
-                        # Try feedparser's media_thumbnail field (commonly present)
-                        try:
-                            mt = entry.get("media_thumbnail") or entry.get("media_thumbnail", None)
-                            if mt:
-                                # media_thumbnail may be a list of dicts
-                                if isinstance(mt, list) and mt:
-                                    image = mt[0].get("url") or mt[0].get("href")
-                                elif isinstance(mt, dict):
-                                    image = mt.get("url") or mt.get("href")
-                        except Exception:
-                            image = None
-
-                        # Fallback to any <img> found in content/summary
-                        if not image:
-                            imgs = extract_all_images(entry)
-                            # Prefer Spinoff-hosted images when available
-                            if name == "spinoff":
-                                for i, u in enumerate(imgs):
-                                    if u.startswith("https://images.thespinoff.co.nz"):
-                                        imgs.insert(0, imgs.pop(i))
-                                        break
-                            image = imgs[0] if imgs else None
-
-                        # Last resort: construct thumbnail from video id in the link or yt:videoId
-                        if not image:
-                            vid = entry.get("yt_videoid") or entry.get("videoId") or entry.get("video_id")
-                            if not vid:
-                                link_for_vid = entry.get("link", "")
-                                m = re.search(r"(?:v=|/videos/|/embed/|/shorts/)([A-Za-z0-9_-]{6,})", link_for_vid)
-                                if m:
-                                    vid = m.group(1)
-                            if vid:
-                                image = f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"
-
-                        # No description for YouTube; summary remains empty
-                    else:
-                        # Non-YouTube: extract images and optionally clean HTML for nicer summary
-                        imgs = extract_all_images(entry)
-                        # Prefer Spinoff-hosted images when available
-                        if name == "spinoff":
-                            for i, u in enumerate(imgs):
-                                if u.startswith("https://images.thespinoff.co.nz"):
-                                    imgs.insert(0, imgs.pop(i))
-                                    break
-                        image = imgs[0] if imgs else None
-                        if feed_cfg.get("clean_html"):
-                            cleaned_summary, cleaned_img = clean_html_summary(entry)
-                            summary = cleaned_summary
-                            if cleaned_img and not image:
-                                image = cleaned_img
-                        else:
-                            summary = entry.get("summary", "")
-                    # Remove description for xkcd feed (user preference)
-                    if name == "xkcd":
-                        summary = ""
-                    # Resolve relative image URLs against feed URL
-                    if image and not image.startswith("http"):
-                        try:
-                            image = urljoin(url, image)
-                        except Exception:
-                            LOG.debug("Failed to resolve image URL %s for feed %s", image, name)
-                    # Validate image URL to avoid Discord embed validation errors
-                    if image:
-                        valid_image = validate_image_url(image)
-                        if not valid_image:
-                            LOG.info("Dropping image for %s because validation failed: %s", name, image)
-                            image = None
-                        else:
-                            image = valid_image
-
-                    sent = send_to_discord(title=title, link=link, webhook_url=webhook, summary=summary, image_url=image)
-                    if sent:
-                        seen_links.add(link)
-                        state.setdefault("feeds", {})[name] = list(seen_links)
-                        save_state(state)
-                    else:
-                        LOG.warning("Will retry this entry later: %s", link)
+    RENEW_BEFORE = 86400.0  # seconds before a lease expires that it is renewed
+    RETRY_AFTER = 3600.0  # seconds before an unverified or failed request is repeated
+    MAX_PENDING = 20  # documents kept per feed until they are processed
+    SIGNATURE_METHODS = ("sha1", "sha256", "sha384", "sha512")
+
+    def __init__(self, callback_url: str, lease_seconds: int, names):
+        self.callback_url = callback_url.rstrip("/")
+        self.lease_seconds = lease_seconds
+        self.names = set(names)
+        self._lock = threading.Lock()
+        self._subs: Dict[str, Optional[Dict]] = {}
+        self._inbox: Dict[str, List[bytes]] = {}
+        self._event = threading.Event()
+
+    def callback(self, name: str) -> str:
+        return f"{self.callback_url}/websub/{quote(name, safe='')}"
+
+    def _sub(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            if name not in self._subs:
+                self._subs[name] = get_store().get_feed_meta(name, "websub")
+            return self._subs[name]
+
+    def _save(self, name: str, sub: Dict) -> None:
+        get_store().set_feed_meta(name, "websub", sub)
+        now = time.time()
+        with self._lock:
+            self._subs[name] = sub
+            active = sum(1 for s in self._subs.values() if s and s["state"] == "active" and s["expires"] > now)
+        METRICS.set("rss_websub_subscriptions", active)
+
+    def active(self, name: str) -> bool:
+        """True if the feed has a verified subscription that has not expired."""
+        sub = self._sub(name) if name in self.names else None
+        return bool(sub) and sub["state"] == "active" and sub["expires"] > time.time()
+
+    def subscribe_feeds(self, feeds: Dict[str, Dict], results: Dict[str, object]) -> None:
+        """Subscribe or renew the feeds of a poll cycle that support WebSub."""
+        for name, parsed in sorted(results.items()):
+            feed_cfg = feeds.get(name)
+            if feed_cfg is None or feed_cfg.get("websub") is False or parsed is None:
+                continue
+            if parsed.get("status") != 200 or parsed.get("pushed"):
+                continue
+            target = feed_handler(feed_cfg).websub(parsed)
+            if target is None:
+                continue
+            try:
+                self.ensure(name, *target)
+            except Exception:
+                LOG.exception("WebSub subscription of %s failed", name)
+
+    def ensure(self, name: str, hub: str, topic: str, now: Optional[float] = None) -> bool:
+        """Ask the hub to (re)subscribe the feed unless its subscription is fresh or a request is
+        still pending; return whether a request was accepted."""
+        now = time.time() if now is None else now
+        sub = self._sub(name)
+        same = sub is not None and sub["hub"] == hub and sub["topic"] == topic
+        if same:
+            if sub["state"] == "active" and sub["expires"] - now > self.RENEW_BEFORE:
+                return False
+            if now - sub["requested"] < self.RETRY_AFTER:
+                return False
+        secret = sub["secret"] if same else secrets.token_hex(20)
+        new = dict(sub) if same else {"hub": hub, "topic": topic, "secret": secret, "state": "pending", "expires": 0.0}
+        new["requested"] = now
+        self._save(name, new)
+        resp = HTTP.post(
+            hub,
+            data={
+                "hub.mode": "subscribe",
+                "hub.topic": topic,
+                "hub.callback": self.callback(name),
+                "hub.secret": secret,
+                "hub.lease_seconds": str(self.lease_seconds),
+                "hub.verify": "async",
+            },
+            timeout=WEBHOOK_TIMEOUT,
+        )
+        accepted = 200 <= resp.status_code < 300
+        METRICS.inc("rss_websub_requests_total", result="accepted" if accepted else "error")
+        if accepted:
+            LOG.info("Requested WebSub subscription of %s at %s", name, hub)
+        else:
+            LOG.warning("Hub %s refused to subscribe %s: HTTP %s %s", hub, name, resp.status_code, resp.text[:200])
+        return accepted
+
+    def verify_intent(self, name: str, query: Dict[str, str]) -> Optional[str]:
+        """Return the challenge to echo to a hub's verification request, or None to refuse it."""
+        mode, topic, challenge = query.get("hub.mode"), query.get("hub.topic"), query.get("hub.challenge")
+        sub = self._sub(name)
+        ours = sub is not None and sub["topic"] == topic
+        if mode == "subscribe" and ours and challenge:
+            try:
+                lease = float(query.get("hub.lease_seconds") or self.lease_seconds)
+            except ValueError:
+                lease = float(self.lease_seconds)
+            self._save(name, dict(sub, state="active", expires=time.time() + lease))
+            LOG.info("WebSub subscription of %s verified for %.0fs", name, lease)
+            return challenge
+        if mode == "unsubscribe" and not ours and challenge:
+            return challenge  # not a subscription this worker wants
+        if mode == "denied" and ours:
+            self._save(name, dict(sub, state="denied"))
+            LOG.warning("Hub denied the WebSub subscription of %s: %s", name, query.get("hub.reason", ""))
+            return ""
+        return None
+
+    def _signed(self, secret: str, body: bytes, signature: Optional[str]) -> bool:
+        method, _, digest = (signature or "").partition("=")
+        if method not in self.SIGNATURE_METHODS:
+            return False
+        return hmac.compare_digest(hmac.new(secret.encode("utf-8"), body, method).hexdigest(), digest.strip().lower())
+
+    def receive(self, name: str, body: bytes, signature: Optional[str]) -> bool:
+        """Queue a pushed document if its signature checks out; return whether it did."""
+        sub = self._sub(name)
+        if sub is None or not self._signed(sub["secret"], body, signature):
+            METRICS.inc("rss_websub_pushes_total", feed=name, result="rejected")
+            LOG.warning("Ignoring WebSub content for %s with a missing or wrong signature", name)
+            return False
+        with self._lock:
+            docs = self._inbox.setdefault(name, [])
+            docs.append(body)
+            del docs[: -self.MAX_PENDING]
+        METRICS.inc("rss_websub_pushes_total", feed=name, result="accepted")
+        self._event.set()
+        return True
+
+    def pushed(self) -> List[str]:
+        """Names of the feeds with pushed documents waiting."""
+        self._event.clear()
+        with self._lock:
+            return list(self._inbox)
+
+    def wait(self, timeout: float) -> None:
+        """Sleep up to `timeout` seconds, waking up when content is pushed."""
+        self._event.wait(max(0.0, timeout))
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._inbox.pop(name, None)
+
+    def take(self, feed_cfg: Dict):
+        """Parse the documents pushed for a feed into one result like fetch_feed()'s, or None.
+
+        The result is marked "pushed" and "truncated": it carries only the entries that were
+        pushed, so no validators are stored and retention is not applied to it.
+        """
+        name = feed_cfg["name"]
+        with self._lock:
+            docs = self._inbox.pop(name, None)
+        if not docs:
+            return None
+        parsed = None
+        entries: Dict[str, object] = {}
+        for doc in reversed(docs):
+            # Newest document first, so its version of an entry wins
+            result = parse_feed_body(doc, feed_cfg["url"])
+            for entry in result.entries:
+                key = entry_key(entry)
+                if key and key not in entries:
+                    entries[key] = entry
+            if parsed is None:
+                parsed = result
+        parsed["entries"] = list(entries.values())
+        parsed["status"] = 200
+        parsed["pushed"] = True
+        parsed["truncated"] = True
+        parsed["scanned_keys"] = []
+        parsed["bytes"] = sum(map(len, docs))
+        LOG.info("Processing %d pushed entries of %s", len(entries), name)
+        return parsed
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Serve the callbacks under /websub/<feed name> on a background thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        websub = self
+
+        class CallbackHandler(BaseHTTPRequestHandler):
+            def _feed(self) -> Optional[str]:
+                path = urlsplit(self.path).path
+                name = unquote(path[len("/websub/"):]) if path.startswith("/websub/") else None
+                return name if name in websub.names else None
+
+            def _reply(self, status: int, body: bytes = b"") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                name = self._feed()
+                query = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+                challenge = websub.verify_intent(name, query) if name else None
+                if challenge is None:
+                    return self._reply(404)
+                self._reply(200, challenge.encode("utf-8"))
+
+            def do_POST(self):
+                name = self._feed()
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if name is None:
+                    return self._reply(404)
+                if length < 0:
+                    return self._reply(400, b"invalid Content-Length")
+                if length > FEED_MAX_BYTES:
+                    return self._reply(413)
+                body = self.rfile.read(length)
+                if len(body) != length:
+                    return self._reply(400, b"body shorter than Content-Length")
+                websub.receive(name, body, self.headers.get("X-Hub-Signature"))
+                # Content with a bad signature is acknowledged as well, as the spec asks
+                self._reply(202)
+
+            def log_message(self, format, *args):
+                LOG.debug("websub callback: " + format, *args)
+
+        server = ThreadingHTTPServer((host, port), CallbackHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="websub", daemon=True).start()
+        LOG.info("Serving WebSub callbacks on %s:%d as %s", host, server.server_address[1], self.callback_url)
+        return server
+
+
+_WEBSUB: Optional[WebSub] = None  # set by start_websub()
+
+
+def start_websub(callback_url: Optional[str], port: int, host: str, names) -> WebSub:
+    """Start push ingestion for the feeds `names`. Without a callback URL the server's own address
+    is used, which only a hub on the same host or network can reach."""
+    global _WEBSUB
+    websub = WebSub(callback_url or "", WEBSUB_LEASE_SECONDS, names)
+    server = websub.serve(port, host)
+    if not callback_url:
+        websub.callback_url = "http://%s:%d" % (host, server.server_address[1])
+    _WEBSUB = websub
+    return websub
+
+
+SY_UPDATE_PERIODS = {"hourly": 3600, "daily": 86400, "weekly": 7 * 86400, "monthly": 30 * 86400, "yearly": 365 * 86400}
+
+
+def _entry_timestamps(parsed) -> List[float]:
+    return sorted(record.published for record in parsed.get("entries") or [] if record.published)
+
+
+def feed_interval_hint(parsed) -> Optional[float]:
+    """Minimum poll interval the feed asks for via <ttl> or sy:updatePeriod/updateFrequency."""
+    feed = parsed.get("feed") or {}
+    hints = []
+    try:
+        if feed.get("ttl"):
+            hints.append(float(feed["ttl"]) * 60)
+    except (TypeError, ValueError):
+        pass
+    period = SY_UPDATE_PERIODS.get(str(feed.get("sy_updateperiod", "")).strip().lower())
+    if period:
+        try:
+            frequency = max(1, int(feed.get("sy_updatefrequency") or 1))
+        except (TypeError, ValueError):
+            frequency = 1
+        hints.append(period / frequency)
+    return max(hints) if hints else None
+
+
+def _poll_failed(parsed) -> bool:
+    if parsed is None:
+        return True
+    status = parsed.get("status")
+    if status is not None:
+        return status >= 400
+    # feedparser's own fetch without a status: only a broken parse without entries is a failure
+    return bool(parsed.get("bozo")) and not parsed.get("entries")
+
+
+class FeedScheduler:
+    """Priority queue of feeds keyed on their next due time.
+
+    After each poll a feed's interval is recomputed: half the median gap between its recent entry
+    timestamps (so new posts are picked up within about half their usual spacing), never below the
+    feed's <ttl>/sy:updatePeriod hint, stretched by up to 2x as its share of 304 replies grows and
+    doubled per consecutive error. The result is clamped to [min_interval, max_interval] and
+    jittered by +/-10% so feeds drift apart instead of being polled in bursts. Schedules are saved
+    in the state store, so a restart continues where the previous process left off.
+    """
 
+    def __init__(self, names: List[str], default_interval: float, min_interval: float, max_interval: float, startup_spread: float = 60.0, now: Optional[float] = None):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._heap: List[Tuple[float, str]] = []
+        self._info: Dict[str, Dict] = {}
+        self.startup_spread = startup_spread
+        now = time.time() if now is None else now
+        for name in names:
+            self.add(name, now)
+
+    def add(self, name: str, now: Optional[float] = None) -> None:
+        """Start scheduling a feed, continuing from its saved schedule if there is one."""
+        if name in self._info:
+            return
+        now = time.time() if now is None else now
+        info = None
+        try:
+            info = get_store().get_feed_meta(name, "schedule")
+        except Exception:
+            LOG.debug("Failed to load schedule of %s", name, exc_info=True)
+        if not info:
+            # Stagger a fresh start over the first minute rather than hitting every feed at once
+            spread = (zlib.crc32(name.encode("utf-8")) % 1000) / 1000.0 * self.startup_spread
+            info = {"interval": self.default_interval, "base": None, "errors": 0, "not_modified": 0.0, "next_due": now + spread}
+        self._info[name] = info
+        heapq.heappush(self._heap, (info["next_due"], name))
+
+    def discard(self, name: str) -> None:
+        """Stop scheduling a feed; its heap entry is dropped lazily."""
+        self._info.pop(name, None)
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._info.get(self._heap[0][1], {}).get("next_due") != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._info)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._info
+
+    def next_due(self) -> Optional[float]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Remove and return the feeds whose next due time has passed."""
+        now = time.time() if now is None else now
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            name = heapq.heappop(self._heap)[1]
+            if name not in due:
+                due.append(name)
+            self._drop_stale()
+        return due
+
+    def record(self, name: str, parsed, now: Optional[float] = None) -> Optional[float]:
+        """Schedule the next poll of `name` from the result of its last poll; returns the interval."""
+        now = time.time() if now is None else now
+        info = self._info.get(name)
+        if info is None:
+            return None  # discarded while it was being polled
+        if parsed is not None and parsed.get("pushed"):
+            pass  # a push says nothing about how often the feed publishes or answers
+        elif _poll_failed(parsed):
+            info["errors"] += 1
+        else:
+            info["errors"] = 0
+            info["not_modified"] = 0.7 * info["not_modified"] + 0.3 * (1.0 if parsed.get("status") == 304 else 0.0)
+            stamps = _entry_timestamps(parsed)[-11:]
+            gaps = sorted(b - a for a, b in zip(stamps, stamps[1:]) if b > a)
+            if gaps:
+                info["base"] = gaps[len(gaps) // 2] / 2
+            hint = feed_interval_hint(parsed)
+            if hint:
+                info["hint"] = hint
+
+        interval = info["base"] or self.default_interval
+        interval = max(interval, info.get("hint") or 0)
+        interval *= 1 + info["not_modified"]
+        interval *= 2 ** min(info["errors"], 6)
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        if _WEBSUB is not None and _WEBSUB.active(name):
+            interval = max(interval, WEBSUB_POLL_INTERVAL)
+        interval *= random.uniform(0.9, 1.1)
+
+        info["interval"] = interval
+        info["next_due"] = now + interval
+        heapq.heappush(self._heap, (info["next_due"], name))
+        try:
+            get_store().set_feed_meta(name, "schedule", info)
         except Exception:
-            LOG.exception("Unexpected error in main loop")
+            LOG.debug("Failed to save schedule of %s", name, exc_info=True)
+        LOG.debug("Next poll of %s in %.0fs", name, interval)
+        return interval
+
+
+def main():
+    LOG.info(
+        "Starting multi-feed -> Discord forwarder. Poll interval=%s seconds (adaptive %s-%s)",
+        POLL_INTERVAL, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL,
+    )
+    if METRICS_PORT:
+        try:
+            start_metrics_server(METRICS_PORT, METRICS_HOST)
+        except OSError:
+            LOG.exception("Could not serve metrics on %s:%d", METRICS_HOST, METRICS_PORT)
+    if METRICS_LOG_INTERVAL > 0:
+        start_metrics_log(METRICS_LOG_INTERVAL)
+    global _SHARD
+    state = load_state()
+    feeds = active_feeds()
+    if WEBSUB_CALLBACK_URL:
+        try:
+            start_websub(WEBSUB_CALLBACK_URL, WEBSUB_PORT, WEBSUB_HOST, feeds)
+        except OSError:
+            LOG.exception("Could not serve WebSub callbacks on %s:%d; polling only", WEBSUB_HOST, WEBSUB_PORT)
+    if not SHARDING:
+        scheduler = FeedScheduler(list(feeds), POLL_INTERVAL, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL)
+        return run_scheduler(state, feeds, scheduler)
+    scheduler = FeedScheduler([], POLL_INTERVAL, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL)
+    _SHARD = start_shard(feeds)
+    try:
+        run_scheduler(state, feeds, scheduler, _SHARD)
+    finally:
+        _SHARD.close()
+
+
+def active_feeds() -> Dict[str, Dict]:
+    """The configured feeds that post to a webhook or write an aggregate, by name."""
+    return {feed_cfg["name"]: feed_cfg for feed_cfg in FEEDS if webhook_for_feed(feed_cfg) or feed_cfg.get("aggregate")}
+
 
-        time.sleep(POLL_INTERVAL)
+def start_shard(feeds: Dict[str, Dict]) -> ShardCoordinator:
+    if STATE_BACKEND != "sqlite":
+        raise ValueError(f"SHARDING needs STATE_BACKEND 'sqlite', not {STATE_BACKEND!r}")
+    shard = ShardCoordinator(STATE_DB_FILE, WORKER_ID, LEASE_TTL)
+    shard.start(list(feeds), LEASE_TTL / 3)
+    LOG.info("Sharding as worker %s", WORKER_ID)
+    return shard
+
+
+def run_once() -> int:
+    """Poll the feeds that are due now, print a JSON summary and return the exit status.
+
+    For running from cron or a job scheduler instead of main()'s loop: feed schedules are kept in
+    the state store as usual, so each run only fetches what is due, and only those feeds' state
+    is loaded. The status is 1 if a feed could not be fetched or an entry not delivered.
+    """
+    global _SHARD
+    started = time.monotonic()
+    feeds = active_feeds()
+    if SHARDING:
+        _SHARD = start_shard(feeds)
+        feeds = {name: feeds[name] for name in _SHARD.owned()}
+    try:
+        # No startup spread: feeds without a saved schedule are due on the first run
+        scheduler = FeedScheduler(list(feeds), POLL_INTERVAL, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL, startup_spread=0)
+        due = scheduler.pop_due(time.time() + SCHEDULE_WINDOW)
+        results: Dict[str, object] = {}
+        if due:
+            if _SHARD is not None:
+                _SHARD.hold(due)  # released by close() below
+            try:
+                results = poll_cycle(load_state(due), [feeds[name] for name in due])
+            except Exception:
+                LOG.exception("Unexpected error polling feeds")
+        for name in due:
+            scheduler.record(name, results.get(name))
+    finally:
+        if _SHARD is not None:
+            # Without a WORKER_ID every run is a new worker (hostname-pid): staying listed would
+            # leave feeds assigned to it that no later run polls
+            _SHARD.close(leave=not os.environ.get("WORKER_ID"))
+
+    statuses: Dict[str, int] = {}
+    failed = 0
+    for name in due:
+        parsed = results.get(name)
+        status = "error" if parsed is None else str(parsed.get("status", "error"))
+        statuses[status] = statuses.get(status, 0) + 1
+        failed += _poll_failed(parsed)
+    metrics = METRICS.summary()
+    counters, startup = metrics["counters"], metrics["gauges"].get("rss_startup_seconds")
+    next_due = scheduler.next_due()
+    summary = {
+        "feeds": len(feeds),
+        "due": len(due),
+        "statuses": statuses,
+        "failed": failed,
+        "entries_new": int(counters.get("rss_entries_new_total", 0)),
+        "entries_sent": int(counters.get("rss_entries_sent_total", 0)),
+        "entries_failed": int(counters.get("rss_entries_failed_total", 0)),
+        "startup_seconds": None if startup is None else round(startup, 3),
+        "seconds": round(time.monotonic() - started, 3),
+        "next_due_in": None if next_due is None else round(max(0.0, next_due - time.time()), 1),
+    }
+    print(json.dumps(summary, sort_keys=True))
+    return 1 if failed or summary["entries_failed"] else 0
+
+
+def apply_shard_changes(state: Dict, feeds: Dict[str, Dict], scheduler: FeedScheduler, shard: ShardCoordinator) -> None:
+    """Start polling the feeds this worker gained and stop polling the ones it lost."""
+    for name, owned in sorted(shard.changes().items()):
+        aggregate = get_aggregate(feeds[name])
+        if owned:
+            # Another worker may have polled it meanwhile: continue from what it saved
+            reload_feed_state(state, name)
+            scheduler.discard(name)
+            scheduler.add(name)
+            LOG.info("Took over feed %s", name)
+        else:
+            scheduler.discard(name)
+            if aggregate is not None:
+                aggregate.disown(name)
+            LOG.info("Handed feed %s to another worker", name)
+
+
+def run_scheduler(state: Dict, feeds: Dict[str, Dict], scheduler: FeedScheduler, shard: Optional[ShardCoordinator] = None) -> None:
+    while True:
+        if shard is not None:
+            apply_shard_changes(state, feeds, scheduler, shard)
+        due = scheduler.pop_due(time.time() + SCHEDULE_WINDOW)
+        # Feeds with pushed content join the cycle; a due feed processes its push instead of polling
+        pushed = []
+        for name in _WEBSUB.pushed() if _WEBSUB is not None else []:
+            if name not in scheduler:
+                _WEBSUB.discard(name)  # owned by another worker, which polls it
+            elif name not in due:
+                pushed.append(name)
+        if due or pushed:
+            results: Dict[str, object] = {}
+            if shard is not None:
+                shard.hold(due + pushed)
+            try:
+                results = poll_cycle(state, [feeds[name] for name in due + pushed])
+            except Exception:
+                LOG.exception("Unexpected error in main loop")
+            finally:
+                if shard is not None:
+                    shard.release(due + pushed)
+            for name in due:
+                scheduler.record(name, results.get(name))
+            if _WEBSUB is not None:
+                _WEBSUB.subscribe_feeds(feeds, results)
+
+        next_due = scheduler.next_due()
+        longest = POLL_INTERVAL if shard is None else min(POLL_INTERVAL, LEASE_TTL / 3)
+        timeout = max(1.0, min(longest, (next_due or 0) - time.time()))
+        if _WEBSUB is not None:
+            _WEBSUB.wait(timeout)
+        else:
+            time.sleep(timeout)
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Forward new RSS/Atom entries to Discord webhooks.")
+    parser.add_argument("--once", action="store_true", help="poll the feeds that are due, print a summary and exit")
+    args = parser.parse_args()
     try:
+        if args.once:
+            sys.exit(run_once())
         main()
     except KeyboardInterrupt:
         LOG.info("Interrupted, exiting")
@@ -97,6 +97,16 @@ async function fetchFeed(url) {
   return Promise.any(attempts);
 }
 
+// Aggregates written by rss.py (feeds.json, youtube.json): one request instead of
+// one proxied request per feed. Rejects if missing so callers can fall back to fetchFeed().
+async function fetchAggregate(name) {
+  const res = await fetch(name, { cache: "no-cache" });
+  if (!res.ok) throw new Error(res.statusText);
+  const data = await res.json();
+  if (!Array.isArray(data.items) || !data.items.length) throw new Error("Empty aggregate");
+  return data.items;
+}
+
 // Parallel channel loading
 async function fetchYouTubeChannelFeed(channelId) {
   const url = `https://www.youtube.com/feeds/videos.xml?channel_id=${channelId}`;
@@ -189,13 +199,27 @@ function createVideoElement(video) {
   return container;
 }
 
+// Videos of the given channels from youtube.json, or null if it is unavailable
+async function fetchYouTubeAggregate(channels = youtubeChannels) {
+  try {
+    const wanted = new Set(channels.map(id => `youtube:${id}`));
+    const videos = (await fetchAggregate("youtube.json")).filter(v => wanted.has(v.feed));
+    return videos.length ? videos : null;
+  } catch (err) {
+    console.warn("youtube.json unavailable, loading channels through proxies", err);
+    return null;
+  }
+}
+
 // Batch append
 async function renderYouTubeFeed(container, channels = youtubeChannels) {
   const fragment = document.createDocumentFragment();
-  const results = await Promise.allSettled(channels.map(fetchYouTubeChannelFeed));
-  const videos = results
-    .filter(r => r.status === "fulfilled")
-    .flatMap(r => r.value)
+  let videos = await fetchYouTubeAggregate(channels);
+  if (!videos) {
+    const results = await Promise.allSettled(channels.map(fetchYouTubeChannelFeed));
+    videos = results.filter(r => r.status === "fulfilled").flatMap(r => r.value);
+  }
+  videos = videos
     .sort((a, b) => new Date(b.pubDate) - new Date(a.pubDate))
     .slice(0, 100);
 
@@ -219,6 +243,8 @@ window.shared = {
   youtubeChannels,
   formatDate,
   fetchFeed,
+  fetchAggregate,
+  fetchYouTubeAggregate,
   fetchYouTubeChannelFeed,
   createVideoElement,
   renderYouTubeFeed